@@ -0,0 +1,358 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = {
+    "week4": os.path.join(ROOT, "week4"),
+    "week6": os.path.join(ROOT, "week6"),
+    "week7": os.path.join(ROOT, "week7"),
+}
+BATCH = 10_000
+
+
+def percentile(samples: list, fraction: float) -> float:
+    # Nearest rank on an already sorted list
+    index = max(int(round(fraction * len(samples))) - 1, 0)
+    return samples[min(index, len(samples) - 1)]
+
+
+def summarize(samples: list, errors: int) -> dict:
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "mean_ms": total / len(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "rps": len(samples) / total if total else 0.0,
+    }
+
+
+def batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def enrollments(rng, students, courses, per_student):
+    per_student = min(per_student, courses)
+    for student in range(1, students + 1):
+        for course in rng.sample(range(1, courses + 1), per_student):
+            yield student, course
+
+
+def seed_database(db, models, rng, args):
+    student_model, course_model, enrollment_model, student_key, course_key = models
+    student_rows = (
+        {"roll_number": f"R{i}", "first_name": f"First{i}", "last_name": f"Last{i}"}
+        for i in range(1, args.students + 1)
+    )
+    course_rows = (
+        {
+            "course_code": f"C{i}",
+            "course_name": f"Course {i}",
+            "course_description": f"Description {i}",
+        }
+        for i in range(1, args.courses + 1)
+    )
+    enrollment_rows = (
+        {student_key: student, course_key: course}
+        for student, course in enrollments(
+            rng, args.students, args.courses, args.enrollments
+        )
+    )
+    for model, rows in (
+        (student_model, student_rows),
+        (course_model, course_rows),
+        (enrollment_model, enrollment_rows),
+    ):
+        for batch in batches(rows):
+            db.session.execute(model.__table__.insert(), batch)
+        db.session.commit()
+
+
+def week4_mix(app, rng, args, directory):
+    with open(os.path.join(directory, "data.csv"), "w") as file:
+        file.write("Student id, Course id, Marks\n")
+        for student, course in enrollments(
+            rng, args.students, args.courses, args.enrollments
+        ):
+            file.write(f"{1000 + student}, {2000 + course}, {rng.randint(0, 100)}\n")
+    os.makedirs(os.path.join(directory, "static"), exist_ok=True)
+
+    def student():
+        value = str(1000 + rng.randint(1, args.students))
+        return "POST", "/", {"data": {"student_id": "on", "value": value}}
+
+    def course():
+        value = str(2000 + rng.randint(1, args.courses))
+        return "POST", "/", {"data": {"course_id": "on", "value": value}}
+
+    return [("home_student", 5, student), ("home_course", 5, course)]
+
+
+def week6_mix(app, rng, args, directory):
+    from app import db, Student, Course, Enrollment
+
+    with app.app_context():
+        seed_database(
+            db,
+            (Student, Course, Enrollment, "student_id", "course_id"),
+            rng,
+            args,
+        )
+    serial = iter(range(10**9))
+
+    def get_course():
+        return "GET", f"/api/course/{rng.randint(1, args.courses)}", {}
+
+    def get_student_courses():
+        return "GET", f"/api/student/{rng.randint(1, args.students)}/course", {}
+
+    def create_student():
+        body = {"roll_number": f"B{next(serial)}", "first_name": "Bench"}
+        return "POST", "/api/student", {"json": body}
+
+    def update_course():
+        course_id = rng.randint(1, args.courses)
+        body = {"course_name": f"Renamed {course_id}", "course_code": f"C{course_id}"}
+        return "PUT", f"/api/course/{course_id}", {"json": body}
+
+    return [
+        ("get_course", 4, get_course),
+        ("get_student_courses", 4, get_student_courses),
+        ("create_student", 1, create_student),
+        ("update_course", 1, update_course),
+    ]
+
+
+def week7_mix(app, rng, args, directory):
+    from app import db, Student, Course, Enrollment
+
+    with app.app_context():
+        db.create_all()
+        seed_database(
+            db,
+            (Student, Course, Enrollment, "estudent_id", "ecourse_id"),
+            rng,
+            args,
+        )
+    serial = iter(range(10**9))
+
+    def index():
+        return "GET", "/", {}
+
+    def course_detail():
+        return "GET", f"/course/{rng.randint(1, args.courses)}", {}
+
+    def student_detail():
+        return "GET", f"/student/{rng.randint(1, args.students)}", {}
+
+    def create_student():
+        data = {"roll": f"B{next(serial)}", "f_name": "Bench", "l_name": "Mark"}
+        return "POST", "/student/create", {"data": data}
+
+    def update_course():
+        course_id = rng.randint(1, args.courses)
+        data = {"c_name": f"Renamed {course_id}", "desc": "Updated"}
+        return "POST", f"/course/{course_id}/update", {"data": data}
+
+    return [
+        ("index", 1, index),
+        ("course_detail", 4, course_detail),
+        ("student_detail", 4, student_detail),
+        ("create_student", 1, create_student),
+        ("update_course", 1, update_course),
+    ]
+
+
+MIXES = {"week4": week4_mix, "week6": week6_mix, "week7": week7_mix}
+
+
+def worker(args):
+    # Runs inside its own process: every app is a module called "app" that
+    # resolves data.csv / static / instance paths from the working directory
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        database = os.path.join(directory, "bench.sqlite3")
+        os.environ["API_DATABASE_URI"] = f"sqlite:///{database}"
+        os.environ["WEEK7_DATABASE_URI"] = f"sqlite:///{database}"
+        sys.path.insert(0, APPS[args.app])
+        from app import app
+
+        app.logger.disabled = True
+        started = time.perf_counter()
+        mix = MIXES[args.app](app, rng, args, directory)
+        seed_seconds = time.perf_counter() - started
+
+        client = app.test_client()
+        names = [name for name, _, _ in mix]
+        weights = [weight for _, weight, _ in mix]
+        factories = {name: factory for name, _, factory in mix}
+        samples = {name: [] for name in names}
+        errors = {name: 0 for name in names}
+
+        for _ in range(args.warmup):
+            method, path, kwargs = factories[rng.choices(names, weights)[0]]()
+            client.open(path, method=method, **kwargs)
+
+        started = time.perf_counter()
+        for name in rng.choices(names, weights, k=args.requests):
+            method, path, kwargs = factories[name]()
+            request_started = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            samples[name].append(time.perf_counter() - request_started)
+            if response.status_code >= 500:
+                errors[name] += 1
+        wall = time.perf_counter() - started
+
+    routes = {
+        name: summarize(samples[name], errors[name]) for name in names if samples[name]
+    }
+    result = {
+        "seed_seconds": seed_seconds,
+        "wall_seconds": wall,
+        "rps": args.requests / wall,
+        "routes": routes,
+    }
+    with open(args.result, "w") as file:
+        json.dump(result, file)
+
+
+def run(args):
+    results = {
+        "meta": {
+            "students": args.students,
+            "courses": args.courses,
+            "enrollments_per_student": args.enrollments,
+            "requests": args.requests,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "apps": {},
+    }
+    for app_name in args.apps:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            result_path = handle.name
+        try:
+            subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "worker",
+                    app_name,
+                    "--result",
+                    result_path,
+                    "--students",
+                    str(args.students),
+                    "--courses",
+                    str(args.courses),
+                    "--enrollments",
+                    str(args.enrollments),
+                    "--requests",
+                    str(args.requests),
+                    "--warmup",
+                    str(args.warmup),
+                    "--seed",
+                    str(args.seed),
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            with open(result_path) as file:
+                results["apps"][app_name] = json.load(file)
+        finally:
+            os.remove(result_path)
+        print_app(app_name, results["apps"][app_name])
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    print(f"Saved {args.output}")
+
+
+def print_app(app_name: str, result: dict):
+    print(f"\n{app_name}: {result['rps']:.1f} req/s overall")
+    print(
+        f"{'route':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}"
+    )
+    for name, route in result["routes"].items():
+        print(
+            f"{name:<22}{route['count']:>7}{route['p50_ms']:>10.2f}"
+            f"{route['p95_ms']:>10.2f}{route['p99_ms']:>10.2f}{route['rps']:>10.1f}"
+        )
+
+
+def compare(args):
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    print(f"{'app/route':<30}{'p50 %':>9}{'p95 %':>9}{'p99 %':>9}{'rps %':>9}")
+    for app_name, result in after["apps"].items():
+        old_routes = before["apps"].get(app_name, {}).get("routes", {})
+        for name, route in result["routes"].items():
+            old = old_routes.get(name)
+            if old is None:
+                continue
+            changes = [
+                (route[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                for key in ("p50_ms", "p95_ms", "p99_ms", "rps")
+            ]
+            print(
+                f"{app_name + '/' + name:<30}" + "".join(f"{c:>+9.1f}" for c in changes)
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route latency benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_size_arguments(command):
+        command.add_argument("--students", type=int, default=1000)
+        command.add_argument("--courses", type=int, default=50)
+        command.add_argument("--enrollments", type=int, default=3)
+        command.add_argument("--requests", type=int, default=2000)
+        command.add_argument("--warmup", type=int, default=100)
+        command.add_argument("--seed", type=int, default=1)
+
+    run_command = commands.add_parser("run")
+    run_command.add_argument(
+        "--apps", nargs="+", choices=list(APPS), default=list(APPS)
+    )
+    run_command.add_argument("--output", default="bench_results.json")
+    add_size_arguments(run_command)
+
+    worker_command = commands.add_parser("worker")
+    worker_command.add_argument("app", choices=list(APPS))
+    worker_command.add_argument("--result", required=True)
+    add_size_arguments(worker_command)
+
+    compare_command = commands.add_parser("compare")
+    compare_command.add_argument("before")
+    compare_command.add_argument("after")
+
+    args = parser.parse_args()
+    {"run": run, "worker": worker, "compare": compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import math
+import sys
+
+import numpy as np
+
+
+CHUNK_STUDENTS = 100_000
+FIRST_STUDENT = 1001
+FIRST_COURSE = 2001
+
+
+def coprime_strides(courses: int) -> np.ndarray:
+    strides = [s for s in range(1, min(courses, 512) + 1) if math.gcd(s, courses) == 1]
+    return np.array(strides, dtype=np.int64)
+
+
+def draw_marks(rng, distribution: str, size: int, difficulty: np.ndarray) -> np.ndarray:
+    if distribution == "uniform":
+        marks = rng.uniform(0, 100, size)
+    elif distribution == "bimodal":
+        low = rng.normal(40, 10, size)
+        high = rng.normal(78, 8, size)
+        marks = np.where(rng.random(size) < 0.4, low, high)
+    else:
+        marks = rng.normal(62, 15, size)
+    return np.clip(np.rint(marks + difficulty), 0, 100).astype(np.int64)
+
+
+def generate(file, students, courses, per_student, distribution, seed):
+    # Streams students*per_student rows, CHUNK_STUDENTS students at a time.
+    # Every student takes per_student distinct courses (offset + j * stride
+    # modulo courses with a stride coprime to courses).
+    rng = np.random.default_rng(seed)
+    per_student = min(per_student, courses)
+    strides = coprime_strides(courses)
+    # Some courses are harder than others
+    course_difficulty = rng.normal(0, 6, courses)
+
+    file.write("Student id, Course id, Marks\n")
+    for start in range(0, students, CHUNK_STUDENTS):
+        count = min(CHUNK_STUDENTS, students - start)
+        student_ids = np.repeat(
+            np.arange(start, start + count, dtype=np.int64) + FIRST_STUDENT,
+            per_student,
+        )
+        offsets = rng.integers(0, courses, count)[:, None]
+        steps = strides[rng.integers(0, len(strides), count)][:, None]
+        course_index = (offsets + np.arange(per_student) * steps) % courses
+        course_index = course_index.ravel()
+
+        marks = draw_marks(
+            rng, distribution, len(course_index), course_difficulty[course_index]
+        )
+        table = np.column_stack([student_ids, course_index + FIRST_COURSE, marks])
+        file.write(("%d, %d, %d\n" * len(table)) % tuple(table.ravel().tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic data.csv")
+    parser.add_argument("output", help="file to write, - for stdout")
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--courses", type=int, default=100)
+    parser.add_argument("--per-student", type=int, default=5)
+    parser.add_argument(
+        "--distribution", choices=["normal", "uniform", "bimodal"], default="normal"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.output == "-":
+        generate(
+            sys.stdout,
+            args.students,
+            args.courses,
+            args.per_student,
+            args.distribution,
+            args.seed,
+        )
+        return
+    with open(args.output, "w", buffering=1 << 20) as file:
+        generate(
+            file,
+            args.students,
+            args.courses,
+            args.per_student,
+            args.distribution,
+            args.seed,
+        )
+
+
+if __name__ == "__main__":
+    main()
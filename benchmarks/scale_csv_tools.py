@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_marks import FIRST_COURSE, FIRST_STUDENT, generate
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (week, function, what it is called with)
+TARGETS = [
+    ("week3", "readCSV", None),
+    ("week3", "studentFunction", "student"),
+    ("week3", "courseFunction", "course"),
+    ("week4", "get_data", None),
+    ("week4", "student", "student"),
+    ("week4", "course", "course"),
+]
+
+
+def measure(args):
+    # Runs in a fresh process so ru_maxrss is the peak of this one call
+    os.chdir(args.directory)
+    os.makedirs("static", exist_ok=True)
+    sys.path.insert(0, os.path.join(ROOT, args.week))
+    import app
+
+    function = getattr(app, args.function)
+    call_args = () if args.argument is None else (args.argument,)
+
+    started = time.perf_counter()
+    function(*call_args)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    function(*call_args)
+    warm = time.perf_counter() - started
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"cold_s": cold, "warm_s": warm, "peak_rss_mb": peak_kb / 1024}))
+
+
+def run(args):
+    results = []
+    print(f"{'rows':>12} {'function':<24}{'cold s':>10}{'warm s':>10}{'peak MB':>10}")
+    for students in args.students:
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "data.csv"), "w") as file:
+                generate(
+                    file,
+                    students,
+                    args.courses,
+                    args.per_student,
+                    args.distribution,
+                    args.seed,
+                )
+            rows = students * min(args.per_student, args.courses)
+            values = {
+                "student": str(FIRST_STUDENT + students // 2),
+                "course": str(FIRST_COURSE + args.courses // 2),
+            }
+            for week, function, argument in TARGETS:
+                command = [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "measure",
+                    directory,
+                    week,
+                    function,
+                ]
+                if argument is not None:
+                    command += ["--argument", values[argument]]
+                output = subprocess.run(
+                    command, check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result.update(rows=rows, function=f"{week}.{function}")
+                results.append(result)
+                print(
+                    f"{rows:>12} {result['function']:<24}{result['cold_s']:>10.3f}"
+                    f"{result['warm_s']:>10.3f}{result['peak_rss_mb']:>10.1f}"
+                )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling harness for week3/week4")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_command = commands.add_parser("run")
+    run_command.add_argument(
+        "--students", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    run_command.add_argument("--courses", type=int, default=100)
+    run_command.add_argument("--per-student", type=int, default=5)
+    run_command.add_argument(
+        "--distribution", choices=["normal", "uniform", "bimodal"], default="normal"
+    )
+    run_command.add_argument("--seed", type=int, default=1)
+    run_command.add_argument("--output")
+
+    measure_command = commands.add_parser("measure")
+    measure_command.add_argument("directory")
+    measure_command.add_argument("week")
+    measure_command.add_argument("function")
+    measure_command.add_argument("--argument")
+
+    args = parser.parse_args()
+    {"run": run, "measure": measure}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
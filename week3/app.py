@@ -1,9 +1,15 @@
 import sys
 import csv
 import os
+import json
+import socket
+import socketserver
+import argparse
 from jinja2 import Template
-import matplotlib.pyplot as plt
 from collections import Counter
+from marks_index import get_index
+from marks_engine import get_summary
+from svg_chart import histogram_svg
 
 
 errorTemplate = Template(
@@ -81,7 +87,7 @@ courseTemplate = Template(
             <td> {{ maximum }}</td>
         </tr>
     </table>
-    <image src="course.png" alt="Course Image">
+    {% if svg %}{{ svg }}{% else %}<image src="{{ chart }}" alt="Course Image">{% endif %}
 </body>
 </html>
 
@@ -102,33 +108,64 @@ def readCSV():
         return []
 
 
-def courseFunction(course_id: str):
+def plotCourse(frequency: dict, chart_path: str):
+    # Plotting the course marks. matplotlib is only imported for PNG output,
+    # it costs more to import than everything else the CLI does.
+    import matplotlib.pyplot as plt
+
+    marks = sorted(frequency)
+    figure = plt.figure(figsize=(10, 5))
+    try:
+        plt.bar(marks, height=[frequency[m] for m in marks], width=4, color="b")
+        plt.xlabel("Marks")
+        plt.ylabel("Frequency")
+        plt.savefig(chart_path)
+    finally:
+        plt.close(figure)
+
+
+def courseStats(each_marks: list) -> dict:
+    return {
+        "count": len(each_marks),
+        "sum": sum(each_marks),
+        "max": max(each_marks),
+        "frequency": Counter(each_marks),
+    }
+
+
+def renderCourse(stats: dict, chart_path: str = None, chart_src: str = None) -> str:
+    # The histogram is inlined as SVG unless a PNG path is given
+    avg_marks = round(stats["sum"] / stats["count"], 1)
+    if chart_path is None:
+        return courseTemplate.render(
+            average=avg_marks,
+            maximum=stats["max"],
+            svg=histogram_svg(stats["frequency"]),
+        )
+    plotCourse(stats["frequency"], chart_path)
+    return courseTemplate.render(
+        average=avg_marks, maximum=stats["max"], chart=chart_src
+    )
+
+
+def renderStudent(students: list) -> str:
+    total_marks = sum(int(rows[2]) for rows in students)
+    return studentTemplate.render(students=students, total_marks=total_marks)
+
+
+def courseFunction(course_id: str, png: bool = False):
     if int(course_id) <= 0:
         errorFunction()
 
-    each_marks = []
-    max_marks = 0
-
-    for rows in readCSV():
-        if rows[1].strip() == course_id:
-            each_marks.append(int(rows[2]))
-            max_marks = max(int(max_marks), int(rows[2]))
+    stats = get_summary().course(course_id)
 
-    if not each_marks:
+    if not stats:
         return "error"
 
-    # Plotting the course marks
-    each_marks = sorted(each_marks)
-    frequency = Counter(each_marks)
-    plt.figure(figsize=(10, 5))
-    plt.bar(frequency.keys(), height=frequency.values(), width=4, color="b")
-    plt.xlabel("Marks")
-    plt.ylabel("Frequency")
-
-    plt.savefig("course.png")
-    avg_marks = round(sum(each_marks) / len(each_marks), 1)
-
-    output = courseTemplate.render(average=avg_marks, maximum=max_marks)
+    if png:
+        output = renderCourse(stats, "course.png", "course.png")
+    else:
+        output = renderCourse(stats)
     with open("output.html", "w") as file:
         file.write(output)
     return "success"
@@ -137,18 +174,12 @@ def courseFunction(course_id: str):
 def studentFunction(student_id: str):
     if int(student_id) <= 0:
         return "error"
-    students = []
-    total_marks = 0
-
-    for rows in readCSV():
-        if rows[0].strip() == student_id:
-            students.append(rows)
-            total_marks = total_marks + int(rows[2])
+    students = get_index().student_records(student_id)
 
     if not students:
         return "error"
 
-    output = studentTemplate.render(students=students, total_marks=total_marks)
+    output = renderStudent(students)
     with open("output.html", "w") as file:
         file.write(output)
 
@@ -161,24 +192,196 @@ def errorFunction():
         file.write(error)
 
 
-def main():
-    print("Welcome to Course and Student Analysis !")
+def groupRows(data: list) -> tuple:
+    # One pass over the csv rows, grouped by student and by course
+    students = {}
+    courses = {}
+    for rows in data:
+        try:
+            marks = int(rows[2])
+        except (IndexError, ValueError):
+            continue
+        students.setdefault(rows[0].strip(), []).append(rows)
+        courses.setdefault(rows[1].strip(), []).append(marks)
+    return students, courses
+
+
+def batchFunction(student_ids, course_ids, output_dir: str, png: bool = False) -> str:
+    # student_ids / course_ids are lists of IDs, or True for every ID
+    students, courses = groupRows(readCSV())
+    os.makedirs(output_dir, exist_ok=True)
+    status = "success"
+
+    if student_ids is True:
+        student_ids = sorted(students)
+    for student_id in student_ids or []:
+        student_id = student_id.strip()
+        if student_id in students:
+            output = renderStudent(students[student_id])
+        else:
+            output = errorTemplate.render()
+            status = "error"
+        with open(os.path.join(output_dir, f"student_{student_id}.html"), "w") as file:
+            file.write(output)
+
+    if course_ids is True:
+        course_ids = sorted(courses)
+    for course_id in course_ids or []:
+        course_id = course_id.strip()
+        if course_id in courses:
+            stats = courseStats(courses[course_id])
+            if png:
+                chart = f"course_{course_id}.png"
+                output = renderCourse(stats, os.path.join(output_dir, chart), chart)
+            else:
+                output = renderCourse(stats)
+        else:
+            output = errorTemplate.render()
+            status = "error"
+        with open(os.path.join(output_dir, f"course_{course_id}.html"), "w") as file:
+            file.write(output)
+
+    return status
 
-    status = ""
 
-    if len(sys.argv) != 3:
-        status = "error"
+def answerQuery(kind: str, item_id: str) -> tuple:
+    # (status, html) of one report, rendered the same way as -s / -c
+    try:
+        valid = int(item_id) > 0
+    except ValueError:
+        valid = False
+    if valid and kind == "student":
+        students = get_index().student_records(item_id)
+        if students:
+            return "success", renderStudent(students)
+    elif valid and kind == "course":
+        stats = get_summary().course(item_id)
+        if stats:
+            return "success", renderCourse(stats)
+    return "error", errorTemplate.render()
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line, one JSON reply per line:
+    # {"kind": "student" | "course", "id": "..."} -> {"status", "html"}
+    # {"kind": "ids"} -> {"students": [...], "courses": [...]}
+    def handle(self):
+        for line in self.rfile:
+            try:
+                query = json.loads(line)
+            except ValueError:
+                query = {}
+            if query.get("kind") == "ids":
+                index = get_index()
+                reply = {
+                    "students": sorted(index.students),
+                    "courses": sorted(index.courses),
+                }
+            else:
+                status, html = answerQuery(query.get("kind"), str(query.get("id")))
+                reply = {"status": status, "html": html}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def serveQueries(socket_path: str):
+    # data.csv is parsed and indexed once up front. get_index / get_summary
+    # check its mtime and size on every query and reload it when it changed.
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX)
+        try:
+            probe.connect(socket_path)
+            print(f"Already serving on {socket_path}")
+            return
+        except OSError:
+            # Left behind by a daemon that did not exit cleanly
+            os.remove(socket_path)
+        finally:
+            probe.close()
+
+    get_index()
+    get_summary()
+    # Requests are handled one at a time, so a reload never races a query
+    server = socketserver.UnixStreamServer(socket_path, QueryHandler)
+    print(f"Serving on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+def parseArgs(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Course and Student Analysis")
+    parser.add_argument("-s", dest="students", nargs="*", metavar="ID")
+    parser.add_argument("-c", dest="courses", nargs="*", metavar="ID")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="every ID of the selected kind (both kinds if neither -s nor -c)",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="write one HTML file per ID in this directory"
+    )
+    parser.add_argument(
+        "--png",
+        action="store_true",
+        help="course charts as PNG files (needs matplotlib) instead of inline SVG",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep data.csv loaded and answer marks_client.py queries",
+    )
+    parser.add_argument(
+        "--socket", default="marks.sock", help="Unix socket of the --serve daemon"
+    )
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return args
+
+    if args.all:
+        if args.students is None and args.courses is None:
+            args.students = args.courses = True
+        else:
+            args.students = True if args.students is not None else None
+            args.courses = True if args.courses is not None else None
+    elif not args.students and not args.courses:
+        parser.error("give -s or -c with at least one ID, or --all")
+    return args
 
-    if sys.argv[1] not in ["-s", "-c"]:
-        status = "error"
 
-    if sys.argv[1] == "-s":
-        output = studentFunction(sys.argv[2])
-        status = output
+def main():
+    print("Welcome to Course and Student Analysis !")
 
-    elif sys.argv[1] == "-c":
-        output = courseFunction(sys.argv[2])
-        status = output
+    try:
+        args = parseArgs(sys.argv[1:])
+    except SystemExit as exit:
+        if exit.code:
+            errorFunction()
+        raise
+
+    if args.serve:
+        serveQueries(args.socket)
+        return
+
+    single = (
+        not args.all
+        and not args.output_dir
+        and len((args.students or []) + (args.courses or [])) == 1
+    )
+
+    if single and args.students:
+        status = studentFunction(args.students[0])
+    elif single:
+        status = courseFunction(args.courses[0], args.png)
+    else:
+        batchFunction(
+            args.students, args.courses, args.output_dir or "reports", args.png
+        )
+        return
 
     if status == "error":
         errorFunction()
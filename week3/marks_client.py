@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+# Only the standard library on purpose: the point of the client is to skip
+# the numpy / jinja2 imports and the data.csv parse that app.py pays for
+
+
+def parseArgs(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Course and Student Analysis, answered by app.py --serve"
+    )
+    parser.add_argument("-s", dest="students", nargs="*", metavar="ID")
+    parser.add_argument("-c", dest="courses", nargs="*", metavar="ID")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="every ID of the selected kind (both kinds if neither -s nor -c)",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="write one HTML file per ID in this directory"
+    )
+    parser.add_argument(
+        "--socket", default="marks.sock", help="Unix socket of the --serve daemon"
+    )
+    args = parser.parse_args(argv)
+
+    if args.all:
+        if args.students is None and args.courses is None:
+            args.students = args.courses = True
+        else:
+            args.students = True if args.students is not None else None
+            args.courses = True if args.courses is not None else None
+    elif not args.students and not args.courses:
+        parser.error("give -s or -c with at least one ID, or --all")
+    return args
+
+
+def ask(connection, reader, query: dict) -> dict:
+    connection.sendall(json.dumps(query).encode() + b"\n")
+    return json.loads(reader.readline())
+
+
+def runQueries(connection, args):
+    reader = connection.makefile("rb")
+    student_ids, course_ids = args.students, args.courses
+    if student_ids is True or course_ids is True:
+        ids = ask(connection, reader, {"kind": "ids"})
+        student_ids = ids["students"] if student_ids is True else student_ids
+        course_ids = ids["courses"] if course_ids is True else course_ids
+
+    queries = [("student", i.strip()) for i in student_ids or []]
+    queries += [("course", i.strip()) for i in course_ids or []]
+    single = not args.all and not args.output_dir and len(queries) == 1
+
+    output_dir = args.output_dir or "reports"
+    if not single:
+        os.makedirs(output_dir, exist_ok=True)
+
+    for kind, item_id in queries:
+        reply = ask(connection, reader, {"kind": kind, "id": item_id})
+        if single:
+            path = "output.html"
+        else:
+            path = os.path.join(output_dir, f"{kind}_{item_id}.html")
+        with open(path, "w") as file:
+            file.write(reply["html"])
+
+
+def main():
+    argv = sys.argv[1:]
+    args = parseArgs(argv)
+
+    connection = socket.socket(socket.AF_UNIX)
+    try:
+        connection.connect(args.socket)
+    except OSError:
+        connection.close()
+        # No daemon running: answer in this process like app.py would
+        print(f"No daemon on {args.socket}, running app.py", file=sys.stderr)
+        import app
+
+        app.main()
+        return
+
+    with connection:
+        runQueries(connection, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import threading
+from itertools import islice
+
+import numpy as np
+
+from marks_index import file_signature
+from marks_snapshot import get_snapshot
+
+
+CHUNK_ROWS = 500_000
+
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    # Yields (student_ids, course_ids, marks) int64 arrays of at most
+    # chunk_rows rows, so only one chunk of the file is in memory at a time
+    with open(path, "r") as file:
+        while True:
+            lines = list(islice(file, chunk_rows))
+            if not lines:
+                return
+            # Drops the header and blank lines
+            lines = [line for line in lines if line.lstrip()[:1].isdigit()]
+            if not lines:
+                continue
+            try:
+                table = np.loadtxt(lines, delimiter=",", dtype=np.int64, ndmin=2)
+            except ValueError:
+                # Some row in this chunk is broken, parse it line by line
+                table = valid_rows(lines)
+            if table.shape[1] != 3:
+                table = valid_rows(lines)
+            yield table[:, 0], table[:, 1], table[:, 2]
+
+
+def valid_rows(lines: list) -> np.ndarray:
+    # Skips the rows MarksIndex.parse_records would skip (fewer than three
+    # fields or marks that are not a number), and rows with non-numeric ids
+    rows = []
+    for line in lines:
+        fields = line.split(",")
+        if len(fields) < 3:
+            continue
+        try:
+            rows.append((int(fields[0]), int(fields[1]), int(fields[2])))
+        except ValueError:
+            continue
+    return np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+
+def count_pairs(keys, marks, counts):
+    # Adds up the counts of equal (key, mark) pairs, sorted by key then mark
+    order = np.lexsort((marks, keys))
+    keys, marks, counts = keys[order], marks[order], counts[order]
+    if not len(keys):
+        return keys, marks, counts
+    starts = np.flatnonzero(
+        np.concatenate([[True], (keys[1:] != keys[:-1]) | (marks[1:] != marks[:-1])])
+    )
+    return keys[starts], marks[starts], np.add.reduceat(counts, starts)
+
+
+class GroupStats:
+    # Aggregates per key, kept as sorted parallel arrays. The histogram is
+    # sparse: one (key, mark, count) entry per mark that occurs, so its size
+    # does not depend on how large or negative the marks are.
+    def __init__(self, with_histogram: bool):
+        self.with_histogram = with_histogram
+        self.keys = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0, dtype=np.int64)
+        self.sum = np.empty(0, dtype=np.int64)
+        self.max = np.empty(0, dtype=np.int64)
+        self.pair_keys = np.empty(0, dtype=np.int64)
+        self.pair_marks = np.empty(0, dtype=np.int64)
+        self.pair_counts = np.empty(0, dtype=np.int64)
+
+    def add(self, keys, marks):
+        if self.with_histogram:
+            self.pair_keys, self.pair_marks, self.pair_counts = count_pairs(
+                np.concatenate([self.pair_keys, keys]),
+                np.concatenate([self.pair_marks, marks]),
+                np.concatenate([self.pair_counts, np.ones(len(keys), dtype=np.int64)]),
+            )
+
+        keys, inverse = np.unique(keys, return_inverse=True)
+        count = np.bincount(inverse, minlength=len(keys)).astype(np.int64)
+        total = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(total, inverse, marks)
+        maximum = np.full(len(keys), np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(maximum, inverse, marks)
+
+        self.merge(keys, count, total, maximum)
+
+    def merge(self, keys, count, total, maximum):
+        all_keys = np.concatenate([self.keys, keys])
+        merged, inverse = np.unique(all_keys, return_inverse=True)
+
+        new_count = np.zeros(len(merged), dtype=np.int64)
+        np.add.at(new_count, inverse, np.concatenate([self.count, count]))
+        new_sum = np.zeros(len(merged), dtype=np.int64)
+        np.add.at(new_sum, inverse, np.concatenate([self.sum, total]))
+        new_max = np.full(len(merged), np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(new_max, inverse, np.concatenate([self.max, maximum]))
+
+        self.keys = merged
+        self.count = new_count
+        self.sum = new_sum
+        self.max = new_max
+
+    def frequency(self, position: int) -> dict:
+        key = self.keys[position]
+        start = np.searchsorted(self.pair_keys, key, side="left")
+        end = np.searchsorted(self.pair_keys, key, side="right")
+        return dict(
+            zip(
+                self.pair_marks[start:end].tolist(),
+                self.pair_counts[start:end].tolist(),
+            )
+        )
+
+    def position(self, key: str):
+        try:
+            key = int(key)
+        except ValueError:
+            return None
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+
+class MarksSummary:
+    def __init__(self):
+        self.courses = GroupStats(with_histogram=True)
+        self.students = GroupStats(with_histogram=False)
+
+    def add_chunk(self, student_ids, course_ids, marks):
+        self.courses.add(course_ids, marks)
+        self.students.add(student_ids, marks)
+
+    def course(self, course_id: str) -> dict:
+        position = self.courses.position(course_id)
+        if position is None:
+            return {}
+        return {
+            "count": int(self.courses.count[position]),
+            "sum": int(self.courses.sum[position]),
+            "max": int(self.courses.max[position]),
+            "frequency": self.courses.frequency(position),
+        }
+
+    def student_total(self, student_id: str):
+        position = self.students.position(student_id)
+        if position is None:
+            return None
+        return int(self.students.sum[position])
+
+
+def summarize(path: str, chunk_rows: int = CHUNK_ROWS) -> MarksSummary:
+    summary = MarksSummary()
+    if os.path.exists(path):
+        for student_ids, course_ids, marks in read_chunks(path, chunk_rows):
+            summary.add_chunk(student_ids, course_ids, marks)
+    return summary
+
+
+_summaries = {}
+_lock = threading.Lock()
+
+
+def get_summary(path: str = "data.csv") -> MarksSummary:
+    # Same rules as marks_index: the snapshot if it is up to date, else
+    # recompute from the CSV on mtime/size change
+    snapshot = get_snapshot(path)
+    if snapshot is not None:
+        return snapshot
+    signature = file_signature(path)
+    with _lock:
+        cached = _summaries.get(path)
+        if cached is None or cached[0] != signature:
+            cached = _summaries[path] = (signature, summarize(path))
+        return cached[1]
@@ -0,0 +1,92 @@
+import csv
+import os
+import threading
+from array import array
+
+
+class MarksIndex:
+    # Parsed once from data.csv: every row is kept a single time and the
+    # student / course lookups only hold row offsets and marks.
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = None
+        self.rows = []
+        self.students = {}
+        self.courses = {}
+
+    def load(self):
+        fresh = MarksIndex(self.path)
+        signature = file_signature(self.path)
+
+        if signature is not None:
+            with open(self.path, "r", newline="") as file:
+                fresh.add_rows(parse_records(csv.reader(file)))
+
+        self.rows = fresh.rows
+        self.students = fresh.students
+        self.courses = fresh.courses
+        self.signature = signature
+
+    def add_rows(self, rows):
+        # Appends (student_id, course_id, marks) rows to the lookups
+        for student_id, course_id, marks in rows:
+            offsets = self.students.get(student_id)
+            if offsets is None:
+                offsets = self.students[student_id] = array("I")
+            offsets.append(len(self.rows))
+
+            course_marks = self.courses.get(course_id)
+            if course_marks is None:
+                course_marks = self.courses[course_id] = array("i")
+            course_marks.append(marks)
+
+            self.rows.append((student_id, course_id, marks))
+
+    def student_records(self, student_id: str) -> list:
+        offsets = self.students.get(student_id.strip(), ())
+        return [self.rows[offset] for offset in offsets]
+
+    def course_marks(self, course_id: str) -> array:
+        return self.courses.get(course_id.strip(), array("i"))
+
+
+def parse_records(records):
+    for record in records:
+        if len(record) < 3:
+            continue
+        try:
+            marks = int(record[2])
+        except ValueError:
+            # Header line or a broken row
+            continue
+        yield record[0].strip(), record[1].strip(), marks
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def file_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_index(path: str = "data.csv") -> MarksIndex:
+    # An up to date marks_snapshot.py snapshot is used as is, otherwise the
+    # CSV is parsed, again only when its mtime or size changed
+    from marks_snapshot import get_snapshot
+
+    snapshot = get_snapshot(path)
+    if snapshot is not None:
+        return snapshot
+    with _lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = MarksIndex(path)
+            index.load()
+        elif index.signature != file_signature(path):
+            index.load()
+        return index
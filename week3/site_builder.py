@@ -0,0 +1,333 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import zlib
+from jinja2 import Template
+from app import renderStudent, renderCourse, courseStats
+
+
+indexTemplate = Template(
+    """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Reports</title>
+</head>
+<body>
+    <h1>Student Reports</h1>
+    <ul>
+    {% for student_id in students %}
+        <li><a href="students/{{ student_id }}.html">{{ student_id }}</a></li>
+    {% endfor %}
+    </ul>
+    <h1>Course Reports</h1>
+    <ul>
+    {% for course_id in courses %}
+        <li><a href="courses/{{ course_id }}.html">{{ course_id }}</a></li>
+    {% endfor %}
+    </ul>
+</body>
+</html>
+"""
+)
+
+
+MANIFEST = "manifest.json"
+# Bytes of data.csv hashed at its start and just before the built offset,
+# to tell an append from a rewrite
+CHECK_BYTES = 4096
+# The rows of every student are kept in this many JSON files under rows/,
+# an append only loads the files of the students it touches
+SHARDS = 256
+
+
+def rowsHash(rows: list) -> str:
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(",".join(str(cell).strip() for cell in row).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def writeJSON(path: str, data):
+    with open(path + ".tmp", "w") as file:
+        json.dump(data, file, separators=(",", ":"), sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def loadManifest(output_dir: str) -> dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def saveManifest(output_dir: str, manifest: dict):
+    writeJSON(os.path.join(output_dir, MANIFEST), manifest)
+
+
+def shardOf(student_id: str) -> int:
+    return zlib.crc32(student_id.encode()) % SHARDS
+
+
+def shardPath(output_dir: str, shard: int) -> str:
+    return os.path.join(output_dir, "rows", f"{shard:02x}.json")
+
+
+def removeFile(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def parseRecords(data: bytes) -> list:
+    # (student id, course id, marks) with the cells stripped, skipping the
+    # header and broken rows like groupRows does
+    records = []
+    for row in csv.reader(io.StringIO(data.decode(errors="replace"))):
+        try:
+            int(row[2])
+        except (IndexError, ValueError):
+            continue
+        records.append((row[0].strip(), row[1].strip(), row[2].strip()))
+    return records
+
+
+def splitRecords(data: bytes) -> tuple:
+    # The records of the complete lines, the record of an unterminated last
+    # line (None if it does not parse) and the length of the complete lines
+    end = data.rfind(b"\n") + 1
+    last = parseRecords(data[end:])
+    return parseRecords(data[:end]), (last[0] if last else None), end
+
+
+def csvState(file, offset: int, pending) -> dict:
+    # pending is already counted in the rows, but sits after offset: it is
+    # taken back and read again once its line is complete
+    stat = os.fstat(file.fileno())
+    file.seek(0)
+    head = file.read(min(offset, CHECK_BYTES))
+    start = max(offset - CHECK_BYTES, 0)
+    file.seek(start)
+    tail = file.read(offset - start)
+    return {
+        "offset": offset,
+        "head": hashlib.sha1(head).hexdigest(),
+        "tail": hashlib.sha1(tail).hexdigest(),
+        "pending": pending,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def addRecord(site: dict, record):
+    student_id, course_id, marks = record
+    shard = site["shards"][shardOf(student_id)]
+    shard.setdefault(student_id, []).append([course_id, marks])
+    frequency = site["course_marks"].setdefault(course_id, {})
+    frequency[str(int(marks))] = frequency.get(str(int(marks)), 0) + 1
+    site["students"].add(student_id)
+    site["courses"].add(course_id)
+
+
+def removeRecord(site: dict, record):
+    student_id, course_id, marks = record
+    shard = site["shards"][shardOf(student_id)]
+    rows = shard.get(student_id)
+    if rows and rows[-1] == [course_id, marks]:
+        rows.pop()
+        if not rows:
+            del shard[student_id]
+    frequency = site["course_marks"].get(course_id, {})
+    key = str(int(marks))
+    if frequency.get(key):
+        frequency[key] -= 1
+        if not frequency[key]:
+            del frequency[key]
+        if not frequency:
+            del site["course_marks"][course_id]
+    site["students"].add(student_id)
+    site["courses"].add(course_id)
+
+
+def scanAll(old: dict) -> dict:
+    # Every row of data.csv, for a first build or after a rewrite. Every ID
+    # of the previous build is checked too, so the gone ones are removed.
+    try:
+        with open("data.csv", "rb") as file:
+            data = file.read()
+            records, pending, end = splitRecords(data)
+            state = csvState(file, end, pending)
+    except OSError:
+        records, pending, state = [], None, None
+    site = {
+        "build": old.get("build", 0) + 1,
+        "shards": {shard: {} for shard in range(SHARDS)},
+        "course_marks": {},
+        "students": set(old.get("students", {})),
+        "courses": set(old.get("courses", {})),
+        "csv": state,
+    }
+    for record in records + ([pending] if pending else []):
+        addRecord(site, record)
+    return site
+
+
+def scanAppended(output_dir: str, old: dict):
+    # Only the bytes after the offset of the last build, as long as what it
+    # read is still there unchanged. None when a full scan is needed.
+    state = old.get("csv")
+    if state is None or "build" not in old or "course_marks" not in old:
+        return None
+    try:
+        with open("data.csv", "rb") as file:
+            offset = state["offset"]
+            stat = os.fstat(file.fileno())
+            if stat.st_size < offset:
+                return None
+            # Written to without growing, so not an append
+            if stat.st_size == state["size"] and stat.st_mtime_ns != state["mtime_ns"]:
+                return None
+            before = csvState(file, offset, None)
+            if (before["head"], before["tail"]) != (state["head"], state["tail"]):
+                return None
+            file.seek(offset)
+            data = file.read()
+            records, pending, end = splitRecords(data)
+            after = csvState(file, offset + end, pending)
+    except OSError:
+        return None
+
+    old_pending = tuple(state["pending"]) if state["pending"] else None
+    touched = records + [record for record in (old_pending, pending) if record]
+
+    site = {
+        "build": old["build"] + 1,
+        "shards": {},
+        "course_marks": old["course_marks"],
+        "students": set(),
+        "courses": set(),
+        "csv": after,
+    }
+    for shard in {shardOf(student_id) for student_id, _, _ in touched}:
+        try:
+            with open(shardPath(output_dir, shard), "r") as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return None
+        # Newer than the manifest: a build stopped before saving it
+        if saved.get("build", 0) > old["build"]:
+            return None
+        site["shards"][shard] = saved["students"]
+
+    if old_pending:
+        removeRecord(site, old_pending)
+    for record in records + ([pending] if pending else []):
+        addRecord(site, record)
+    return site
+
+
+def buildSite(output_dir: str = "site") -> dict:
+    # Re-renders only the pages whose rows changed since the last build.
+    # When data.csv only grew, just the appended rows are parsed; otherwise
+    # it is read in full and every page is compared through its digest.
+    old = loadManifest(output_dir)
+    student_dir = os.path.join(output_dir, "students")
+    course_dir = os.path.join(output_dir, "courses")
+    os.makedirs(student_dir, exist_ok=True)
+    os.makedirs(course_dir, exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "rows"), exist_ok=True)
+
+    site = scanAppended(output_dir, old)
+    if site is None:
+        site = scanAll(old)
+    manifest = {
+        "build": site["build"],
+        "csv": site["csv"],
+        "course_marks": site["course_marks"],
+        "students": dict(old.get("students", {})),
+        "courses": dict(old.get("courses", {})),
+    }
+    built = {"students": 0, "courses": 0, "removed": 0, "index": False}
+
+    for student_id in site["students"]:
+        page = os.path.join(student_dir, f"{student_id}.html")
+        rows = site["shards"][shardOf(student_id)].get(student_id)
+        if not rows:
+            # Gone from data.csv
+            if manifest["students"].pop(student_id, None) is not None:
+                removeFile(page)
+                built["removed"] += 1
+            continue
+        rows = [[student_id, course_id, marks] for course_id, marks in rows]
+        digest = rowsHash(rows)
+        if manifest["students"].get(student_id) == digest and os.path.exists(page):
+            continue
+        manifest["students"][student_id] = digest
+        with open(page, "w") as file:
+            file.write(renderStudent(rows))
+        built["students"] += 1
+
+    for course_id in site["courses"]:
+        page = os.path.join(course_dir, f"{course_id}.html")
+        frequency = site["course_marks"].get(course_id)
+        if not frequency:
+            if manifest["courses"].pop(course_id, None) is not None:
+                removeFile(page)
+                # Left over from builds that still wrote PNG charts
+                removeFile(os.path.join(course_dir, f"{course_id}.png"))
+                built["removed"] += 1
+            continue
+        each_marks = sorted(
+            int(marks) for marks, count in frequency.items() for _ in range(count)
+        )
+        digest = rowsHash([[marks] for marks in each_marks])
+        if manifest["courses"].get(course_id) == digest and os.path.exists(page):
+            continue
+        manifest["courses"][course_id] = digest
+        with open(page, "w") as file:
+            file.write(renderCourse(courseStats(each_marks)))
+        built["courses"] += 1
+
+    students = sorted(manifest["students"])
+    courses = sorted(manifest["courses"])
+    index = os.path.join(output_dir, "index.html")
+    manifest["index"] = rowsHash([students, courses])
+    if old.get("index") != manifest["index"] or not os.path.exists(index):
+        output = indexTemplate.render(students=students, courses=courses)
+        with open(index, "w") as file:
+            file.write(output)
+        built["index"] = True
+
+    # The rows first: a manifest older than its rows makes the next build
+    # read everything again instead of counting an append twice
+    for shard, rows in site["shards"].items():
+        writeJSON(
+            shardPath(output_dir, shard), {"build": site["build"], "students": rows}
+        )
+    saveManifest(output_dir, manifest)
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the static report site")
+    parser.add_argument("output_dir", nargs="?", default="site")
+    args = parser.parse_args()
+
+    built = buildSite(args.output_dir)
+    print(
+        f"Rendered {built['students']} student and {built['courses']} course "
+        f"pages, removed {built['removed']}"
+        + (", rebuilt index" if built["index"] else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
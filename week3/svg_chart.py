@@ -0,0 +1,98 @@
+import math
+
+
+WIDTH = 500
+HEIGHT = 400
+# Space for the tick labels and axis titles
+LEFT, RIGHT, TOP, BOTTOM = 60, 15, 15, 50
+# Same bar width (in marks) as the matplotlib charts
+BAR_WIDTH = 4
+COLOR = "#0000ff"
+
+
+def nice_step(span: float, ticks: int = 5) -> float:
+    # 1, 2 or 5 times a power of ten, giving about `ticks` ticks over span
+    raw = max(span, 1e-9) / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 5, 10):
+        if multiple * magnitude >= raw:
+            return multiple * magnitude
+    return 10 * magnitude
+
+
+def tick_values(low: float, high: float, step: float) -> list:
+    first = math.ceil(low / step)
+    last = math.floor(high / step)
+    return [round(i * step, 10) for i in range(first, last + 1)]
+
+
+def tick_label(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+
+def histogram_svg(frequency: dict, width: int = WIDTH, height: int = HEIGHT) -> str:
+    # One bar per distinct mark, like plt.bar over a Counter of the marks
+    marks = sorted(frequency)
+    if not marks:
+        return ""
+    low = marks[0] - BAR_WIDTH / 2
+    high = marks[-1] + BAR_WIDTH / 2
+    padding = (high - low) * 0.05
+    low, high = low - padding, high + padding
+    top_count = max(frequency.values()) * 1.05
+
+    plot_width = width - LEFT - RIGHT
+    plot_height = height - TOP - BOTTOM
+
+    def x(value):
+        return LEFT + (value - low) / (high - low) * plot_width
+
+    def y(value):
+        return TOP + plot_height - value / top_count * plot_height
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" role="img" aria-label="Marks frequency">',
+        f'<rect x="{LEFT}" y="{TOP}" width="{plot_width}" height="{plot_height}" '
+        'fill="none" stroke="#000"/>',
+    ]
+    for mark in marks:
+        left = x(mark - BAR_WIDTH / 2)
+        bar_top = y(frequency[mark])
+        parts.append(
+            f'<rect x="{left:.1f}" y="{bar_top:.1f}" '
+            f'width="{x(mark + BAR_WIDTH / 2) - left:.1f}" '
+            f'height="{y(0) - bar_top:.1f}" fill="{COLOR}">'
+            f"<title>{mark}: {frequency[mark]}</title></rect>"
+        )
+
+    bottom = TOP + plot_height
+    for value in tick_values(low, high, nice_step(high - low)):
+        position = x(value)
+        parts.append(
+            f'<line x1="{position:.1f}" y1="{bottom}" x2="{position:.1f}" '
+            f'y2="{bottom + 5}" stroke="#000"/>'
+            f'<text x="{position:.1f}" y="{bottom + 18}" font-size="12" '
+            f'text-anchor="middle">{tick_label(value)}</text>'
+        )
+    # Counts are whole numbers, so no ticks in between
+    for value in tick_values(0, top_count, max(nice_step(top_count), 1)):
+        position = y(value)
+        parts.append(
+            f'<line x1="{LEFT - 5}" y1="{position:.1f}" x2="{LEFT}" '
+            f'y2="{position:.1f}" stroke="#000"/>'
+            f'<text x="{LEFT - 8}" y="{position + 4:.1f}" font-size="12" '
+            f'text-anchor="end">{tick_label(value)}</text>'
+        )
+
+    parts.append(
+        f'<text x="{LEFT + plot_width / 2:.1f}" y="{height - 10}" font-size="14" '
+        'text-anchor="middle">Marks</text>'
+    )
+    parts.append(
+        f'<text x="15" y="{TOP + plot_height / 2:.1f}" font-size="14" '
+        f'text-anchor="middle" transform="rotate(-90 15 {TOP + plot_height / 2:.1f})">'
+        "Frequency</text>"
+    )
+    parts.append("</svg>")
+    return "\n".join(parts)
@@ -1,44 +1,38 @@
 from flask import Flask, render_template, request, redirect, url_for
 import os
 import csv
-import matplotlib.pyplot as plt
-from collections import Counter
+from marks_ingest import get_marks
+from chart_cache import course_chart
+from svg_chart import histogram_svg
 
 app = Flask(__name__)
+# Chart file names are content addressed, so browsers may keep them for long
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 365 * 24 * 60 * 60
+# "svg" inlines the histogram in the page, "png" renders it with matplotlib
+app.config["CHART_FORMAT"] = os.environ.get("CHART_FORMAT", "svg")
 
 
 def course(course_id: str) -> dict:
-    data = get_data()
-    course_records = []
+    stats = get_marks().course(course_id)
     course = {"average_marks": 0, "maximum_marks": 0}
-    for record in data:
-        if record[1].strip() == course_id:
-            course_records.append(record)
-    if not course_records:
+    if not stats:
         return {}
-    total_marks = sum(int(record[2]) for record in course_records)
-    course["average_marks"] = total_marks / len(course_records)
-    course["maximum_marks"] = max(int(record[2]) for record in course_records)
+    course["average_marks"] = stats["sum"] / stats["count"]
+    course["maximum_marks"] = stats["max"]
 
     # Plotting the course marks
-    each_marks = sorted(int(record[2]) for record in course_records)
-    frequency = Counter(each_marks)
-    plt.figure(figsize=(10, 5))
-    plt.bar(frequency.keys(), height=frequency.values(), width=4, color="b")
-    plt.xlabel("Marks")
-    plt.ylabel("Frequency")
-    plt.savefig("static/course.png")
+    if app.config["CHART_FORMAT"] == "png":
+        course["chart"] = course_chart(course_id, stats["frequency"])
+    else:
+        course["chart_svg"] = histogram_svg(stats["frequency"])
 
     return course
 
 
 def student(student_id: str) -> tuple:
-    data = get_data()
-    student_records = []
-    for record in data:
-        if record[0].strip() == student_id:
-            student_records.append(record)
-    total_marks = sum(int(record[2]) for record in student_records)
+    marks = get_marks()
+    student_records = marks.student_records(student_id)
+    total_marks = marks.student_total(student_id) or 0
     return student_records, total_marks
 
 
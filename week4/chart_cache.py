@@ -0,0 +1,76 @@
+import hashlib
+import os
+import threading
+
+
+CHART_DIR = "static"
+MAX_FILES = 256
+MAX_BYTES = 64 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def distribution_hash(frequency: dict) -> str:
+    digest = hashlib.sha1()
+    for marks, count in sorted(frequency.items()):
+        digest.update(f"{marks}:{count};".encode())
+    return digest.hexdigest()[:16]
+
+
+def course_chart(course_id: str, frequency: dict) -> str:
+    # Returns the file name (relative to the static folder) of the histogram
+    # for this marks distribution, rendering it only if it is not cached yet
+    safe_id = "".join(c for c in course_id.strip() if c.isalnum())
+    filename = f"course_{safe_id}_{distribution_hash(frequency)}.png"
+    path = os.path.join(CHART_DIR, filename)
+
+    with _lock:
+        if os.path.exists(path):
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+            return filename
+
+        render_chart(frequency, path)
+        evict()
+    return filename
+
+
+def render_chart(frequency: dict, path: str):
+    # Imported on the first PNG only, the SVG charts do not need matplotlib
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    figure = plt.figure(figsize=(10, 5))
+    try:
+        marks = sorted(frequency)
+        plt.bar(marks, height=[frequency[m] for m in marks], width=4, color="b")
+        plt.xlabel("Marks")
+        plt.ylabel("Frequency")
+        figure.savefig(temp_path, format="png")
+        os.replace(temp_path, path)
+    finally:
+        plt.close(figure)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def evict():
+    # Least recently used charts go first until both limits are respected
+    charts = []
+    for name in os.listdir(CHART_DIR):
+        if name.startswith("course_") and name.endswith(".png"):
+            stat = os.stat(os.path.join(CHART_DIR, name))
+            charts.append((stat.st_mtime, stat.st_size, name))
+
+    charts.sort()
+    total_bytes = sum(size for _, size, _ in charts)
+    while charts and (len(charts) > MAX_FILES or total_bytes > MAX_BYTES):
+        _, size, name = charts.pop(0)
+        try:
+            os.remove(os.path.join(CHART_DIR, name))
+        except OSError:
+            pass
+        total_bytes -= size
@@ -0,0 +1,178 @@
+import csv
+import io
+import os
+import threading
+from itertools import islice
+
+import numpy as np
+
+from marks_engine import CHUNK_ROWS, MarksSummary
+from marks_index import MarksIndex, parse_records
+from marks_snapshot import get_snapshot
+
+
+# Bytes compared at the start of the file and just before the last read
+# offset to tell an append from a rewrite
+CHECK_BYTES = 4096
+
+
+def numeric_records(records):
+    # The aggregates are keyed by int64 ids, so like valid_rows in
+    # marks_engine.py the rows whose ids are not numbers are skipped
+    for record in records:
+        try:
+            int(record[0])
+            int(record[1])
+        except ValueError:
+            continue
+        yield record
+
+
+def same_id(key: str, record_id: str) -> bool:
+    try:
+        return int(key) == int(record_id)
+    except ValueError:
+        return False
+
+
+class MarksIngest:
+    # Per-course and per-student aggregates of a data.csv that only ever
+    # grows at the end. Every refresh parses just the bytes appended since
+    # the previous one; a truncated or rewritten file is read from scratch.
+    # A last row without its newline is kept aside in pending and only
+    # merged into the answers, offset stays at its start so the completed
+    # line is aggregated once the rest of it arrives.
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime_ns = None
+        self.reset(None)
+
+    def reset(self, identity):
+        self.identity = identity
+        self.size = None
+        self.offset = 0
+        self.pending = None
+        self.head = b""
+        self.tail = b""
+        self.summary = MarksSummary()
+        self.index = MarksIndex(self.path)
+
+    def read_range(self, file, start: int, end: int) -> bytes:
+        file.seek(start)
+        return file.read(end - start)
+
+    def appended_to(self, file, identity) -> bool:
+        # Same file, and what was read before is still there unchanged
+        if identity != self.identity:
+            return False
+        if self.read_range(file, 0, len(self.head)) != self.head:
+            return False
+        start = self.offset - len(self.tail)
+        return self.read_range(file, start, self.offset) == self.tail
+
+    def refresh(self):
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self.reset(None)
+                return
+            identity = (stat.st_dev, stat.st_ino)
+            if identity == self.identity and stat.st_size == self.size:
+                if stat.st_mtime_ns == self.mtime_ns:
+                    return
+                # Written to without growing, so not an append
+                self.reset(identity)
+
+            with open(self.path, "rb") as file:
+                if stat.st_size < self.offset or not self.appended_to(file, identity):
+                    self.reset(identity)
+                file.seek(self.offset)
+                self.ingest(file)
+                self.head = self.read_range(file, 0, min(self.offset, CHECK_BYTES))
+                self.tail = self.read_range(
+                    file, max(self.offset - CHECK_BYTES, 0), self.offset
+                )
+            self.size = stat.st_size
+            self.mtime_ns = stat.st_mtime_ns
+
+    def ingest(self, file):
+        self.pending = None
+        while True:
+            lines = list(islice(file, CHUNK_ROWS))
+            if not lines:
+                return
+            partial = not lines[-1].endswith(b"\n")
+            if partial:
+                # Either the file just does not end in a newline or the row
+                # is still being written, read again from its start next time
+                last = lines.pop().decode(errors="replace")
+                records = numeric_records(parse_records(csv.reader([last])))
+                self.pending = next(records, None)
+
+            text = io.StringIO(b"".join(lines).decode())
+            rows = list(numeric_records(parse_records(csv.reader(text))))
+            if rows:
+                student_ids, course_ids, marks = zip(*rows)
+                self.summary.add_chunk(
+                    np.array(student_ids).astype(np.int64),
+                    np.array(course_ids).astype(np.int64),
+                    np.array(marks, dtype=np.int64),
+                )
+                self.index.add_rows(rows)
+            self.offset += sum(len(line) for line in lines)
+            if partial:
+                return
+
+    # Same lookups as MarksIndex / MarksSummary, safe against a refresh
+    # running in another request thread
+    def course(self, course_id: str) -> dict:
+        with self.lock:
+            stats = self.summary.course(course_id)
+            pending = self.pending
+        if pending is None or not same_id(course_id, pending[1]):
+            return stats
+        marks = pending[2]
+        frequency = dict(stats.get("frequency", {}))
+        frequency[marks] = frequency.get(marks, 0) + 1
+        return {
+            "count": stats.get("count", 0) + 1,
+            "sum": stats.get("sum", 0) + marks,
+            "max": max(stats.get("max", marks), marks),
+            "frequency": frequency,
+        }
+
+    def student_total(self, student_id: str):
+        with self.lock:
+            total = self.summary.student_total(student_id)
+            pending = self.pending
+        if pending is None or not same_id(student_id, pending[0]):
+            return total
+        return (total or 0) + pending[2]
+
+    def student_records(self, student_id: str) -> list:
+        with self.lock:
+            records = self.index.student_records(student_id)
+            pending = self.pending
+        if pending is None or not same_id(student_id, pending[0]):
+            return records
+        return records + [pending]
+
+
+_ingests = {}
+_lock = threading.Lock()
+
+
+def get_marks(path: str = "data.csv"):
+    # An up to date snapshot if there is one, else the running aggregates
+    # brought up to date with whatever was appended to the CSV
+    snapshot = get_snapshot(path)
+    if snapshot is not None:
+        return snapshot
+    with _lock:
+        ingest = _ingests.get(path)
+        if ingest is None:
+            ingest = _ingests[path] = MarksIngest(path)
+    ingest.refresh()
+    return ingest
@@ -0,0 +1,220 @@
+import argparse
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+from marks_index import file_signature
+
+
+# Binary copy of data.csv that is opened with mmap instead of parsed.
+# After the header, every section is a little endian int32 array:
+#   row_students, row_courses, row_marks  rows by student, in file order
+#   student_ids, student_offsets          row range of each student
+#   course_ids, course_offsets            range of each course in ...
+#   course_marks                          ... all marks sorted by course, marks
+# The header also holds the mtime and size of the CSV it was built from,
+# a snapshot is only used while they still match.
+MAGIC = b"MARKSNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sIqqqqq")
+HEADER_SIZE = 64
+INT32 = np.dtype("<i4")
+
+
+def snapshot_path(path: str) -> str:
+    return f"{path}.snap"
+
+
+def compile_snapshot(path: str = "data.csv", output: str = None) -> str:
+    from marks_engine import read_chunks
+
+    output = output or snapshot_path(path)
+    # Taken before reading, so rows appended meanwhile make it stale
+    signature = file_signature(path)
+    if signature is None:
+        raise FileNotFoundError(path)
+
+    chunks = list(read_chunks(path))
+    if chunks:
+        students, courses, marks = (np.concatenate(c) for c in zip(*chunks))
+    else:
+        students = courses = marks = np.empty(0, dtype=np.int64)
+    del chunks
+    for column in (students, courses, marks):
+        if len(column) and (column.min() < -(2**31) or column.max() >= 2**31):
+            raise ValueError("ids and marks have to fit in 32 bits")
+
+    by_student = np.argsort(students, kind="stable")
+    student_ids, student_starts = np.unique(students[by_student], return_index=True)
+    by_course = np.lexsort((marks, courses))
+    course_ids, course_starts = np.unique(courses[by_course], return_index=True)
+    rows = len(marks)
+
+    sections = [
+        students[by_student],
+        courses[by_student],
+        marks[by_student],
+        student_ids,
+        np.append(student_starts, rows),
+        course_ids,
+        np.append(course_starts, rows),
+        marks[by_course],
+    ]
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        signature[0],
+        signature[1],
+        rows,
+        len(student_ids),
+        len(course_ids),
+    )
+    temp_path = f"{output}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(header.ljust(HEADER_SIZE, b"\0"))
+        for section in sections:
+            file.write(section.astype(INT32).tobytes())
+    os.replace(temp_path, output)
+    return output
+
+
+class MarksSnapshot:
+    # Answers the MarksIndex and MarksSummary lookups straight from the
+    # mapped file: binary searches over the id columns, no parsing
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, mtime_ns, size, rows, students, courses = HEADER.unpack_from(
+            self.buffer
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a marks snapshot")
+        self.signature = (mtime_ns, size)
+
+        offset = HEADER_SIZE
+        columns = []
+        counts = [rows, rows, rows, students, students + 1, courses, courses + 1, rows]
+        for count in counts:
+            columns.append(
+                np.frombuffer(self.buffer, dtype=INT32, count=count, offset=offset)
+            )
+            offset += count * INT32.itemsize
+        (
+            self.row_students,
+            self.row_courses,
+            self.row_marks,
+            self.student_ids,
+            self.student_offsets,
+            self.course_ids,
+            self.course_offsets,
+            self.course_sorted_marks,
+        ) = columns
+
+    @staticmethod
+    def find(ids, key: str):
+        try:
+            # A Python int would make numpy widen the whole column to int64
+            key = np.int32(int(key))
+        except (ValueError, OverflowError):
+            return None
+        position = int(np.searchsorted(ids, key))
+        if position < len(ids) and ids[position] == key:
+            return position
+        return None
+
+    def student_range(self, student_id: str) -> slice:
+        position = self.find(self.student_ids, student_id)
+        if position is None:
+            return slice(0, 0)
+        return slice(self.student_offsets[position], self.student_offsets[position + 1])
+
+    def course_marks(self, course_id: str):
+        position = self.find(self.course_ids, course_id)
+        if position is None:
+            return self.course_sorted_marks[:0]
+        start, end = self.course_offsets[position], self.course_offsets[position + 1]
+        return self.course_sorted_marks[start:end]
+
+    # MarksIndex
+    @property
+    def students(self) -> list:
+        return [str(student_id) for student_id in self.student_ids]
+
+    @property
+    def courses(self) -> list:
+        return [str(course_id) for course_id in self.course_ids]
+
+    def student_records(self, student_id: str) -> list:
+        rows = self.student_range(student_id)
+        return list(
+            zip(
+                map(str, self.row_students[rows].tolist()),
+                map(str, self.row_courses[rows].tolist()),
+                self.row_marks[rows].tolist(),
+            )
+        )
+
+    # MarksSummary
+    def course(self, course_id: str) -> dict:
+        marks = self.course_marks(course_id)
+        if not len(marks):
+            return {}
+        # Sorted within the course, so equal marks are runs
+        starts = np.flatnonzero(np.diff(marks, prepend=marks[0] - 1))
+        counts = np.diff(starts, append=len(marks))
+        return {
+            "count": len(marks),
+            "sum": int(marks.sum(dtype=np.int64)),
+            "max": int(marks[-1]),
+            "frequency": dict(zip(marks[starts].tolist(), counts.tolist())),
+        }
+
+    def student_total(self, student_id: str):
+        rows = self.student_range(student_id)
+        if rows.start == rows.stop:
+            return None
+        return int(self.row_marks[rows].sum(dtype=np.int64))
+
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get_snapshot(path: str = "data.csv"):
+    # The snapshot of path if there is one built from its current contents,
+    # None to make the caller fall back to parsing the CSV
+    signature = file_signature(path)
+    snapshot_signature = file_signature(snapshot_path(path))
+    if signature is None or snapshot_signature is None:
+        return None
+    with _lock:
+        cached = _snapshots.get(path)
+        if cached is None or cached[0] != snapshot_signature:
+            try:
+                cached = (snapshot_signature, MarksSnapshot(snapshot_path(path)))
+            except (OSError, ValueError, struct.error):
+                cached = (snapshot_signature, None)
+            _snapshots[path] = cached
+    snapshot = cached[1]
+    if snapshot is None or snapshot.signature != signature:
+        return None
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile data.csv into a snapshot")
+    parser.add_argument("csv", nargs="?", default="data.csv")
+    parser.add_argument(
+        "-o", "--output", help="defaults to <csv>.snap, the file the apps look for"
+    )
+    args = parser.parse_args()
+
+    output = compile_snapshot(args.csv, args.output)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import pytest
+
+import marks_ingest
+from app import app
+
+
+HEADER = "Student id, Course id, Marks\n"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The app reads data.csv from the working directory
+    monkeypatch.chdir(tmp_path)
+    marks_ingest._ingests.clear()
+    yield app.test_client()
+    marks_ingest._ingests.clear()
+
+
+def write_csv(text: str, mode: str = "w"):
+    with open("data.csv", mode) as file:
+        file.write(text)
+
+
+def ask_course(client, course_id: str) -> str:
+    response = client.post("/", data={"course_id": "on", "value": course_id})
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def ask_student(client, student_id: str) -> str:
+    response = client.post("/", data={"student_id": "on", "value": student_id})
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_malformed_row_in_the_first_load_is_skipped(client):
+    write_csv(HEADER + "1001, 2001, 40\nabc, 2001, 50\n1002, x, 60\n1003, 2001, 80\n")
+    page = ask_course(client, "2001")
+    assert "60.0" in page
+    assert "80" in page
+    assert "Wrong Inputs" in ask_student(client, "abc")
+
+
+def test_malformed_row_appended_later_is_skipped(client):
+    write_csv(HEADER + "1001, 2001, 40\n")
+    assert "40.0" in ask_course(client, "2001")
+
+    write_csv("abc, 2001, 50\n1002, 2001, 80\n", "a")
+    page = ask_course(client, "2001")
+    assert "60.0" in page
+
+    # The offset moved past the broken row, later appends still count
+    write_csv("1003, 2001, 90\nabc, 2001, 1", "a")
+    page = ask_course(client, "2001")
+    assert "70.0" in page
+    assert "90" in ask_student(client, "1003")
+
+
+def test_out_of_range_marks_keep_their_own_bins(client):
+    write_csv(HEADER + "1001, 2001, 2000000000\n1002, 2001, -5\n1003, 2001, 50\n")
+    assert "2000000000" in ask_course(client, "2001")
+    frequency = marks_ingest.get_marks().course("2001")["frequency"]
+    assert frequency == {-5: 1, 50: 1, 2000000000: 1}
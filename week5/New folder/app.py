@@ -1,7 +1,11 @@
 from flask import Flask, render_template, request, redirect, url_for
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Index
+from sqlalchemy import insert, delete
 from flask_sqlalchemy import SQLAlchemy
+import csv
+import io
 import os
+from sqlite_profile import configure_sqlite, migrate_indexes
 
 app = Flask(__name__)
 
@@ -33,8 +37,16 @@ class Enrollments(db.Model):
     estudent_id = Column(Integer, ForeignKey("student.student_id"), nullable=False)
     ecourse_id = Column(Integer, ForeignKey("course.course_id"), nullable=False)
 
+    __table_args__ = (
+        Index(
+            "ix_enrollments_student_course", "estudent_id", "ecourse_id", unique=True
+        ),
+        Index("ix_enrollments_course_student", "ecourse_id", "estudent_id"),
+    )
+
 
 db.init_app(app=app)
+configure_sqlite(app, db)
 app.app_context().push()
 
 
@@ -72,6 +84,20 @@ if not os.path.exists("instance/database.sqlite3"):
     db.session.add_all(courses)
     db.session.commit()
 
+migrate_indexes(app, db, Enrollments)
+
+
+def add_enrollments(student_ids_courses: list):
+    # One executemany for every (student, course) pair of the batch
+    if student_ids_courses:
+        db.session.execute(
+            insert(Enrollments),
+            [
+                {"estudent_id": student_id, "ecourse_id": course}
+                for student_id, course in student_ids_courses
+            ],
+        )
+
 
 @app.route("/student/create", methods=["GET", "POST"])
 def addstudent():
@@ -89,13 +115,11 @@ def addstudent():
 
         student = Student(roll_number=roll, first_name=first, last_name=last)
         db.session.add(student)
+        # Flush only to get the student_id, everything is committed together
+        db.session.flush()
+        add_enrollments([(student.student_id, course) for course in set(courses)])
         db.session.commit()
 
-        for course in courses:
-            enrollment = Enrollments(estudent_id=student.student_id, ecourse_id=course)
-            db.session.add(enrollment)
-            db.session.commit()
-
         return redirect(url_for("home"))
 
     return render_template("addstudent.html")
@@ -117,12 +141,108 @@ def update(studentId):
         student.roll_number = roll
         student.first_name = first
         student.last_name = last
+
+        enrolled = {
+            course
+            for (course,) in db.session.query(Enrollments.ecourse_id).filter_by(
+                estudent_id=student.student_id
+            )
+        }
+        selected = set(courses)
+        removed = enrolled - selected
+        if removed:
+            db.session.execute(
+                delete(Enrollments).where(
+                    Enrollments.estudent_id == student.student_id,
+                    Enrollments.ecourse_id.in_(removed),
+                )
+            )
+        add_enrollments(
+            [(student.student_id, course) for course in selected - enrolled]
+        )
         db.session.commit()
 
     print(student)
     return render_template("addstudent.html", student=student)
 
 
+@app.route("/student/upload", methods=["GET", "POST"])
+def uploadstudents():
+    # CSV columns: roll_number, first_name, last_name, courses (";" separated)
+    if request.method == "POST":
+        upload = request.files.get("students")
+        if not upload:
+            return redirect(url_for("home"))
+
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding="utf-8"))
+        rows = []
+        for row in reader:
+            roll = (row.get("roll_number") or "").strip()
+            first = (row.get("first_name") or "").strip()
+            last = (row.get("last_name") or "").strip()
+            courses = {c.strip() for c in (row.get("courses") or "").split(";")}
+            courses.discard("")
+            rows.append((roll, first, last, courses))
+
+        known_courses = {course for (course,) in db.session.query(Course.course_id)}
+        existing = set()
+        rolls = [row[0] for row in rows]
+        for start in range(0, len(rolls), 500):
+            existing.update(
+                roll
+                for (roll,) in db.session.query(Student.roll_number).filter(
+                    Student.roll_number.in_(rolls[start : start + 500])
+                )
+            )
+
+        students = {}
+        skipped = []
+        for roll, first, last, courses in rows:
+            if (
+                not roll
+                or not first
+                or not last
+                or not courses
+                or not courses <= known_courses
+                or roll in existing
+                or roll in students
+            ):
+                skipped.append(roll)
+                continue
+            students[roll] = (first, last, courses)
+
+        if students:
+            db.session.execute(
+                insert(Student),
+                [
+                    {"roll_number": roll, "first_name": first, "last_name": last}
+                    for roll, (first, last, courses) in students.items()
+                ],
+            )
+            new_ids = {}
+            rolls = list(students)
+            for start in range(0, len(rolls), 500):
+                new_ids.update(
+                    db.session.query(Student.roll_number, Student.student_id).filter(
+                        Student.roll_number.in_(rolls[start : start + 500])
+                    )
+                )
+            add_enrollments(
+                [
+                    (new_ids[roll], course)
+                    for roll, (first, last, courses) in students.items()
+                    for course in courses
+                ]
+            )
+            db.session.commit()
+
+        return render_template(
+            "addstudent.html", uploaded=len(students), skipped=skipped
+        )
+
+    return render_template("addstudent.html", upload=True)
+
+
 @app.route("/", methods=["GET", "POST"])
 def home():
     students = Student.query.all()
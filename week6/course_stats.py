@@ -0,0 +1,153 @@
+import json
+import math
+
+from sqlalchemy import event, inspect, text
+
+
+# Marks 0-9, 10-19, ..., 90-100 (100 goes into the last bucket)
+BUCKET_WIDTH = 10
+BUCKETS = 10
+EMPTY_HISTOGRAM = json.dumps([0] * BUCKETS)
+
+
+def bucket_path(marks: str) -> str:
+    # JSON path of the histogram slot for a marks expression
+    return f"'$[' || MIN({marks} / {BUCKET_WIDTH}, {BUCKETS - 1}) || ']'"
+
+
+class CourseStatsTriggers:
+    # Keeps one summary row per course (count, sum, sum of squares, max and
+    # histogram of the marks) in step with the enrollments table, so the
+    # statistics are a primary key lookup instead of a scan of the roster
+    def __init__(self, stats_table, enrollment_table):
+        self.stats = stats_table
+        self.enrollments = enrollment_table
+
+    def add(self, row: str) -> str:
+        path = bucket_path(f"{row}.marks")
+        return (
+            f"INSERT INTO {self.stats.name}"
+            "(course_id, count, total, total_squares, maximum, histogram) "
+            f"SELECT {row}.course_id, 1, {row}.marks, {row}.marks * {row}.marks, "
+            f"{row}.marks, json_set('{EMPTY_HISTOGRAM}', {path}, 1) "
+            f"WHERE {row}.marks IS NOT NULL "
+            "ON CONFLICT(course_id) DO UPDATE SET "
+            "count = count + 1, "
+            "total = total + excluded.total, "
+            "total_squares = total_squares + excluded.total_squares, "
+            # maximum is NULL once every marked enrollment has left
+            "maximum = MAX(COALESCE(maximum, excluded.maximum), excluded.maximum), "
+            f"histogram = json_set(histogram, {path}, "
+            f"json_extract(histogram, {path}) + 1);"
+        )
+
+    def remove(self, row: str) -> str:
+        # The maximum cannot be taken back, so when the best mark leaves it
+        # is looked up again on the (course_id, marks) index
+        path = bucket_path(f"{row}.marks")
+        return (
+            f"UPDATE {self.stats.name} SET "
+            "count = count - 1, "
+            f"total = total - {row}.marks, "
+            f"total_squares = total_squares - {row}.marks * {row}.marks, "
+            f"maximum = CASE WHEN {row}.marks < maximum THEN maximum ELSE "
+            f"(SELECT MAX(marks) FROM {self.enrollments.name} "
+            f"WHERE course_id = {row}.course_id) END, "
+            f"histogram = json_set(histogram, {path}, "
+            f"json_extract(histogram, {path}) - 1) "
+            f"WHERE course_id = {row}.course_id AND {row}.marks IS NOT NULL;"
+        )
+
+    def rebuild(self, connection):
+        buckets = ", ".join(
+            f"SUM(MIN(marks / {BUCKET_WIDTH}, {BUCKETS - 1}) = {bucket})"
+            for bucket in range(BUCKETS)
+        )
+        connection.execute(text(f"DELETE FROM {self.stats.name}"))
+        connection.execute(
+            text(
+                f"INSERT INTO {self.stats.name}"
+                "(course_id, count, total, total_squares, maximum, histogram) "
+                "SELECT course_id, COUNT(*), SUM(marks), SUM(marks * marks), "
+                f"MAX(marks), json_array({buckets}) "
+                f"FROM {self.enrollments.name} WHERE marks IS NOT NULL "
+                "GROUP BY course_id"
+            )
+        )
+
+    def create(self, connection):
+        name = self.stats.name
+        source = self.enrollments.name
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+            {"name": f"{name}_insert"},
+        ).first()
+        if exists:
+            return
+
+        self.stats.create(connection, checkfirst=True)
+        connection.execute(
+            text(
+                f"CREATE TRIGGER {name}_insert AFTER INSERT ON {source} "
+                f"BEGIN {self.add('new')} END"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER {name}_delete AFTER DELETE ON {source} "
+                f"BEGIN {self.remove('old')} END"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER {name}_update AFTER UPDATE OF course_id, marks "
+                f"ON {source} BEGIN {self.remove('old')} {self.add('new')} END"
+            )
+        )
+        # Summarize the enrollments that were there before the triggers
+        self.rebuild(connection)
+
+
+def stats_to_dict(course_id, stats):
+    if stats is None or not stats.count:
+        return {
+            "course_id": course_id,
+            "count": 0,
+            "average": None,
+            "std_dev": None,
+            "max": None,
+            "histogram": histogram_to_list([0] * BUCKETS),
+        }
+    average = stats.total / stats.count
+    variance = max(stats.total_squares / stats.count - average * average, 0)
+    return {
+        "course_id": course_id,
+        "count": stats.count,
+        "average": round(average, 2),
+        "std_dev": round(math.sqrt(variance), 2),
+        "max": stats.maximum,
+        "histogram": histogram_to_list(json.loads(stats.histogram)),
+    }
+
+
+def histogram_to_list(counts: list) -> list:
+    ranges = []
+    for bucket, count in enumerate(counts):
+        low = bucket * BUCKET_WIDTH
+        high = 100 if bucket == BUCKETS - 1 else low + BUCKET_WIDTH - 1
+        ranges.append({"range": f"{low}-{high}", "count": count})
+    return ranges
+
+
+def install_course_stats(app, db, stats_model, enrollment_model):
+    # Sets up the summary table and its triggers now for an existing
+    # database, and later right after create_all builds a new one
+    triggers = CourseStatsTriggers(stats_model.__table__, enrollment_model.__table__)
+    event.listen(
+        db.metadata,
+        "after_create",
+        lambda target, connection, **kw: triggers.create(connection),
+    )
+    with app.app_context(), db.engine.begin() as connection:
+        if inspect(connection).has_table(triggers.enrollments.name):
+            triggers.create(connection)
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import re
+
+
+# Rows fetched from the cursor and formatted per write
+BATCH = 5000
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+NEEDS_QUOTES = re.compile(r'[,"\r\n]|^\s|\s$')
+
+
+class ExportSpec:
+    # A select statement and the names of its columns. The CSV is written
+    # with csv.writer, unless a csv_header is given: then it is a data.csv
+    # file (that header, ", " between the fields) of the csv_keys columns.
+    def __init__(self, statement, keys: list, csv_keys: list = None, csv_header=None):
+        self.statement = statement
+        self.keys = keys
+        self.csv_keys = csv_keys or keys
+        self.csv_header = csv_header
+
+
+def csv_field(value) -> str:
+    # A field of the data.csv layout. Its readers split on the commas
+    # without unquoting, text with a comma, quote, newline or edge spaces
+    # is quoted all the same.
+    if value is None:
+        return ""
+    if type(value) is int:
+        return str(value)
+    value = str(value)
+    if NEEDS_QUOTES.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def export_chunks(session, spec: ExportSpec, fmt: str):
+    # One text chunk per BATCH rows, read with a streaming cursor so only
+    # one batch is in memory however big the table is. Plain Core rows on
+    # the session's connection, nothing is loaded into the ORM.
+    statement = spec.statement.execution_options(yield_per=BATCH)
+    result = session.connection().execute(statement)
+    positions = [spec.keys.index(key) for key in spec.csv_keys]
+    if fmt == "csv" and spec.csv_header is not None:
+        yield spec.csv_header + "\n"
+        for rows in result.partitions():
+            yield "".join(
+                ", ".join(csv_field(row[i]) for i in positions) + "\n" for row in rows
+            )
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        yield ",".join(spec.csv_keys) + "\n"
+        for rows in result.partitions():
+            writer.writerows([row[i] for i in positions] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        for rows in result.partitions():
+            yield "".join(json.dumps(dict(zip(spec.keys, row))) + "\n" for row in rows)
+
+
+def export_to_file(session, spec: ExportSpec, fmt: str, file) -> None:
+    for chunk in export_chunks(session, spec, fmt):
+        file.write(chunk)
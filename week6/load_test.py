@@ -0,0 +1,164 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def start_server(port, threads, database):
+    env = dict(os.environ, API_DATABASE_URI=f"sqlite:///{database}")
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", str(port), "--threads", str(threads)],
+        cwd=HERE,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def seed(port, students, courses):
+    request(
+        port,
+        "POST",
+        "/api/course/bulk",
+        [
+            {"course_code": f"C{i}", "course_name": f"Course {i}"}
+            for i in range(courses)
+        ],
+    )
+    request(
+        port,
+        "POST",
+        "/api/student/bulk",
+        [{"roll_number": f"S{i}", "first_name": "Load"} for i in range(students)],
+    )
+
+
+def client(port, students, courses, write_ratio, stop, counts, lock, worker):
+    rng = random.Random(worker)
+    done = errors = 0
+    serial = 0
+    while not stop.is_set():
+        choice = rng.random()
+        student_id = rng.randint(1, students)
+        if choice < write_ratio / 2:
+            serial += 1
+            status = request(
+                port,
+                "POST",
+                "/api/student",
+                {"roll_number": f"W{worker}-{serial}", "first_name": "Load"},
+            )
+        elif choice < write_ratio:
+            status = request(
+                port,
+                "POST",
+                f"/api/student/{student_id}/course",
+                {"course_id": rng.randint(1, courses)},
+            )
+        elif choice < 0.6:
+            status = request(port, "GET", f"/api/student/{student_id}")
+        elif choice < 0.8:
+            status = request(port, "GET", f"/api/course/{rng.randint(1, courses)}")
+        else:
+            status = request(port, "GET", f"/api/student/{student_id}/course")
+        done += 1
+        if status >= 500:
+            errors += 1
+    with lock:
+        counts["requests"] += done
+        counts["errors"] += errors
+
+
+def run(threads, clients, duration, students, courses, write_ratio):
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        server = start_server(port, threads, os.path.join(directory, "load.sqlite3"))
+        try:
+            seed(port, students, courses)
+            stop = threading.Event()
+            lock = threading.Lock()
+            counts = {"requests": 0, "errors": 0}
+            workers = [
+                threading.Thread(
+                    target=client,
+                    args=(port, students, courses, write_ratio, stop, counts, lock, i),
+                )
+                for i in range(clients)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            time.sleep(duration)
+            stop.set()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+    return counts["requests"] / elapsed, counts["errors"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write load test")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'req/s':>10} {'5xx':>6}")
+    for threads in args.threads:
+        throughput, errors = run(
+            threads,
+            args.clients,
+            args.duration,
+            args.students,
+            args.courses,
+            args.write_ratio,
+        )
+        print(f"{threads:>8} {throughput:>10.1f} {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    def __init__(self, body: str, tags: set, expires: float):
+        self.body = body
+        self.etag = hashlib.sha1(body.encode()).hexdigest()
+        self.tags = tags
+        self.expires = expires
+
+
+class ResponseCache:
+    # LRU + TTL cache of serialized JSON bodies. Every entry is tagged with
+    # its own key and the keys of the rows it was built from, so a write can
+    # drop exactly the entries that depend on it.
+    # Every invalidate() also stamps its tags with a new generation. A reader
+    # takes generation() before going to the database and passes it to
+    # set(), which then leaves the body uncached if one of its tags was
+    # invalidated meanwhile: a write that committed during the read would
+    # otherwise be hidden behind the stale body until the TTL.
+    def __init__(self, max_entries: int = 4096, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tagged = {}
+        self.current_generation = 0
+        self.invalidated_at = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self) -> int:
+        with self.lock:
+            return self.current_generation
+
+    def set(self, key: str, data, tags=(), since: int = None) -> CacheEntry:
+        body = json.dumps(data, sort_keys=True)
+        entry = CacheEntry(body, {key, *tags}, time.monotonic() + self.ttl)
+        with self.lock:
+            if since is not None and any(
+                self.invalidated_at.get(tag, -1) > since for tag in entry.tags
+            ):
+                self.stale_sets += 1
+                return entry
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            for tag in entry.tags:
+                self.tagged.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, *tags):
+        with self.lock:
+            self.current_generation += 1
+            for tag in tags:
+                self.invalidated_at[tag] = self.current_generation
+                for key in list(self.tagged.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        for tag in entry.tags:
+            keys = self.tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_sets": self.stale_sets,
+            }
@@ -0,0 +1,58 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # Hands every accepted connection to a fixed pool of worker threads.
+    # Flask-SQLAlchemy scopes db.session to the app context of each request
+    # and removes it at teardown, so a worker never shares a session.
+    # multithread is what the app sees as wsgi.multithread, and makes
+    # werkzeug answer with HTTP/1.1 (chunked streaming of the exports).
+    multithread = True
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the week6 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    # The engine is created when app is imported, so size its pool first
+    os.environ["DB_POOL_SIZE"] = str(args.threads)
+    from app import app
+
+    server = PooledWSGIServer(args.host, args.port, app, args.threads)
+    print(f"Serving on http://{args.host}:{args.port} with {args.threads} threads")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+
+SLOWEST = 5
+# The same statement shape this many times in one request looks like N+1
+REPEAT_THRESHOLD = 5
+
+
+def statement_shape(statement: str) -> str:
+    shape = re.sub(r"\s+", " ", statement).strip()
+    shape = re.sub(r"'[^']*'", "?", shape)
+    shape = re.sub(r"\b\d+\b", "?", shape)
+    # IN (?, ?, ?) of any length is one shape
+    return re.sub(r"\(\?(?:, \?)*\)", "(?)", shape)
+
+
+class SQLMetrics:
+    def __init__(self, app, db):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self.before_execute)
+            event.listen(db.engine, "after_cursor_execute", self.after_execute)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule("/debug/metrics", "debug_metrics", self.metrics_view)
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        if has_request_context() and "sql_statements" in g:
+            g.sql_statements.append((statement, elapsed))
+
+    def start_request(self):
+        g.sql_statements = []
+
+    def finish_request(self, response):
+        statements = g.pop("sql_statements", [])
+        total = sum(elapsed for _, elapsed in statements)
+        shapes = Counter(statement_shape(statement) for statement, _ in statements)
+        repeated = {
+            shape: count for shape, count in shapes.items() if count >= REPEAT_THRESHOLD
+        }
+
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={total * 1000:.2f};desc="{len(statements)} statements"',
+        )
+        if repeated:
+            response.headers.add(
+                "Server-Timing", f'n-plus-one;desc="{len(repeated)} shapes"'
+            )
+
+        self.record(request.endpoint or request.path, statements, total, repeated)
+        return response
+
+    def record(self, endpoint, statements, total, repeated):
+        with self.lock:
+            route = self.routes.setdefault(
+                endpoint,
+                {
+                    "requests": 0,
+                    "statements": 0,
+                    "max_statements": 0,
+                    "db_time_ms": 0.0,
+                    "slowest": [],
+                    "n_plus_one": {},
+                },
+            )
+            route["requests"] += 1
+            route["statements"] += len(statements)
+            route["max_statements"] = max(route["max_statements"], len(statements))
+            route["db_time_ms"] += total * 1000
+
+            slowest = route["slowest"] + [
+                {"statement": statement, "ms": elapsed * 1000}
+                for statement, elapsed in statements
+            ]
+            slowest.sort(key=lambda item: item["ms"], reverse=True)
+            route["slowest"] = slowest[:SLOWEST]
+
+            for shape, count in repeated.items():
+                seen = route["n_plus_one"].get(shape, 0)
+                route["n_plus_one"][shape] = max(seen, count)
+
+    def metrics_view(self):
+        with self.lock:
+            routes = {}
+            for endpoint, route in self.routes.items():
+                routes[endpoint] = dict(
+                    route,
+                    avg_statements=route["statements"] / route["requests"],
+                    avg_db_time_ms=route["db_time_ms"] / route["requests"],
+                )
+        return jsonify(routes), 200
+
+
+def init_sql_metrics(app, db):
+    return SQLMetrics(app, db)
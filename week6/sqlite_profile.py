@@ -0,0 +1,80 @@
+from sqlalchemy import event, inspect, text
+
+
+# Applied to every new SQLite connection
+PRAGMAS = [
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "foreign_keys=ON",
+    "mmap_size=268435456",
+    "cache_size=-65536",
+    "temp_store=MEMORY",
+    "busy_timeout=5000",
+]
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def configure_sqlite(app, db):
+    # Has to run before the engine opens its first connection
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", set_sqlite_pragmas)
+
+
+def migrate_indexes(app, db, *models):
+    # Creates the indexes declared on the models that an existing database
+    # file does not have yet. Before a missing unique index is built, the
+    # duplicate rows that would block it are dropped (and logged).
+    with app.app_context(), db.engine.begin() as connection:
+        for model in models:
+            table = model.__table__
+            inspector = inspect(connection)
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                if index.unique:
+                    columns = ", ".join(column.name for column in index.columns)
+                    removed = connection.execute(
+                        text(
+                            f"DELETE FROM {table.name} WHERE rowid NOT IN "
+                            f"(SELECT MIN(rowid) FROM {table.name} GROUP BY {columns})"
+                        )
+                    ).rowcount
+                    if removed:
+                        app.logger.warning(
+                            "Removed %d duplicate rows from %s to create %s",
+                            removed,
+                            table.name,
+                            index.name,
+                        )
+                index.create(connection)
+
+
+def migrate_columns(app, db, *models):
+    # Adds the columns declared on the models that an existing database
+    # file is missing. SQLite can only append nullable columns this way.
+    with app.app_context(), db.engine.begin() as connection:
+        for model in models:
+            table = model.__table__
+            inspector = inspect(connection)
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                    )
+                )
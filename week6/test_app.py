@@ -0,0 +1,129 @@
+import csv
+import io
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import event, insert
+
+# app.py connects and creates its tables at import time
+database_dir = tempfile.TemporaryDirectory()
+os.environ["API_DATABASE_URI"] = f"sqlite:///{database_dir.name}/test.sqlite3"
+
+from app import app, db, Course, Student, Enrollment, response_cache  # noqa: E402
+
+
+ROSTER = 3000
+SMALL = 5
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Course 1 and student 1 have a roster of ROSTER, course 2 and student 2
+    # one of SMALL, so a query per row would show up as a difference
+    with app.app_context():
+        db.session.execute(insert(Course), [
+            {"course_id": i, "course_name": f"Course {i}", "course_code": f"C{i}"}
+            for i in range(1, ROSTER + 3)
+        ])
+        db.session.execute(insert(Student), [
+            {"student_id": i, "roll_number": f"R{i}", "first_name": f"Student {i}"}
+            for i in range(1, ROSTER + 3)
+        ])
+        enrollments = [(i, 1) for i in range(3, ROSTER + 3)]
+        enrollments += [(i, 2) for i in range(3, SMALL + 3)]
+        enrollments += [(1, i) for i in range(3, ROSTER + 3)]
+        enrollments += [(2, i) for i in range(3, SMALL + 3)]
+        db.session.execute(insert(Enrollment), [
+            {"student_id": student_id, "course_id": course_id, "marks": 50}
+            for student_id, course_id in enrollments
+        ])
+        db.session.commit()
+        engine = db.engine
+    yield app.test_client()
+    engine.dispose()
+    database_dir.cleanup()
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def statements_for(client, statements, url):
+    statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+
+def test_student_courses_statements_do_not_grow_with_enrollments(client, statements):
+    response_cache.invalidate("student_courses:1", "student_courses:2")
+    small, courses = statements_for(client, statements, "/api/student/2/course")
+    assert len(courses) == SMALL
+    large, courses = statements_for(client, statements, "/api/student/1/course")
+    assert len(courses) == ROSTER
+    assert 0 < large == small
+
+
+def test_course_students_statements_do_not_grow_with_roster(client, statements):
+    small, page = statements_for(client, statements, f"/api/course/2/student?limit={ROSTER}")
+    assert len(page["items"]) == SMALL
+    large, page = statements_for(client, statements, f"/api/course/1/student?limit={ROSTER}")
+    assert len(page["items"]) == ROSTER
+    assert 0 < large == small
+
+
+def test_student_courses_served_from_cache(client, statements):
+    response_cache.invalidate("student_courses:1")
+    statements_for(client, statements, "/api/student/1/course")
+    statements.clear()
+    response = client.get("/api/student/1/course")
+    assert response.status_code == 200
+    assert statements == []
+
+
+def test_body_read_before_an_invalidate_is_not_cached():
+    # A GET that read the row, then a write that committed and invalidated
+    # before the GET stored its body
+    generation = response_cache.generation()
+    response_cache.invalidate("course:7")
+    response_cache.set("course:7", {"course_id": 7}, since=generation)
+    assert response_cache.get("course:7") is None
+
+    generation = response_cache.generation()
+    response_cache.set("course:7", {"course_id": 7}, since=generation)
+    assert response_cache.get("course:7") is not None
+
+
+def test_courses_export_reads_back_with_csv_reader(client):
+    description = 'Programming, Data Structures and "Algorithms"'
+    with app.app_context():
+        db.session.execute(insert(Course), [{
+            "course_id": 99999, "course_name": " Spaced ", "course_code": "CSV1",
+            "course_description": description
+        }])
+        db.session.commit()
+
+    response = client.get("/api/export/courses")
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["course_id", "course_code", "course_name", "course_description"]
+    assert rows[-1] == ["99999", "CSV1", " Spaced ", description]
+    assert all(len(row) == 4 for row in rows)
+
+
+def test_enrollments_export_keeps_the_data_csv_layout(client):
+    response = client.get("/api/export/enrollments")
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "Student id, Course id, Marks"
+    assert lines[1] == "3, 1, 50"
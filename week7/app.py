@@ -1,11 +1,22 @@
 from flask import Flask, render_template, request, redirect, url_for
+from flask import Response, stream_template, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index, func, null, select
+import click
 import os
+import zlib
+from sqlite_profile import configure_sqlite, migrate_indexes
+from sql_metrics import init_sql_metrics
+from search_index import SearchIndex, install_search, match_expression
+from data_export import FORMATS, ExportSpec, export_chunks, export_to_file
 
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///week7_database.sqlite3"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "WEEK7_DATABASE_URI", "sqlite:///week7_database.sqlite3"
+)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# ?all=1 listings are gzipped for clients that accept it
+app.config["STREAM_GZIP"] = os.environ.get("WEEK7_STREAM_GZIP", "1") != "0"
 
 db = SQLAlchemy(app)
 
@@ -29,23 +40,168 @@ class Enrollment(db.Model):
     estudent_id = Column(Integer, db.ForeignKey("student.student_id"), nullable=False)
     ecourse_id = Column(Integer, db.ForeignKey("course.course_id"), nullable=False)
 
+    __table_args__ = (
+        Index("ix_enrollment_student_course", "estudent_id", "ecourse_id", unique=True),
+        Index("ix_enrollment_course_student", "ecourse_id", "estudent_id"),
+    )
+
     student = db.relationship("Student", backref="enrollments")
     course = db.relationship("Course", backref="enrollments")
 
 
+student_search = SearchIndex(
+    "student_fts", Student.__table__, ["roll_number", "first_name", "last_name"]
+)
+course_search = SearchIndex(
+    "course_fts", Course.__table__, ["course_code", "course_name", "course_description"]
+)
+
+configure_sqlite(app, db)
+migrate_indexes(app, db, Enrollment)
+install_search(app, db, student_search, course_search)
+
+# Opt-in: SQL_METRICS=1 python app.py
+if os.environ.get("SQL_METRICS"):
+    init_sql_metrics(app, db)
+
+
+PER_PAGE = 50
+# Rows fetched from the cursor at a time, and bytes sent per write, when a
+# whole listing is streamed
+STREAM_BATCH = 1000
+STREAM_CHUNK = 16 * 1024
+
+
+def listing_with_counts(key_column, enrollment_column, search):
+    # The rows joined with a GROUP BY subquery of enrollment counts, and
+    # their total. With ?q= only the FTS hits are listed, best ranked first.
+    query = request.args.get("q", "").strip()
+
+    counts = (
+        db.session.query(
+            enrollment_column.label("owner_id"),
+            func.count(Enrollment.enrollment_id).label("enrollment_count"),
+        )
+        .group_by(enrollment_column)
+        .subquery()
+    )
+    listing = db.session.query(
+        key_column.class_, func.coalesce(counts.c.enrollment_count, 0)
+    ).outerjoin(counts, counts.c.owner_id == key_column)
+
+    if match_expression(query):
+        hits = search.matches(query)
+        total = db.session.query(func.count()).select_from(hits).scalar()
+        listing = listing.join(hits, hits.c.rowid == key_column).order_by(hits.c.rank)
+    else:
+        query = ""
+        total = db.session.query(func.count(key_column)).scalar()
+        listing = listing.order_by(key_column)
+    return listing, total, query
+
+
+def paginate_with_counts(key_column, enrollment_column, search):
+    # Two statements per page whatever the size of the table
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", PER_PAGE, type=int), 1), 500)
+    listing, total, query = listing_with_counts(key_column, enrollment_column, search)
+
+    rows = listing.limit(per_page).offset((page - 1) * per_page).all()
+    pages = max((total + per_page - 1) // per_page, 1)
+    return rows, {
+        "page": page,
+        "per_page": per_page,
+        "pages": pages,
+        "total": total,
+        "offset": (page - 1) * per_page,
+        "q": query,
+    }
+
+
+def buffered(chunks):
+    # Jinja yields a few bytes per template statement, sent in bigger writes
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_CHUNK:
+            yield "".join(pending).encode()
+            pending = []
+            size = 0
+    if pending:
+        yield "".join(pending).encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Sync flush so every chunk reaches the client as soon as it is ready
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def stream_listing(template, name, key_column, enrollment_column, search):
+    # ?all=1: every row in one page, rendered while the cursor is read
+    # STREAM_BATCH rows at a time, so memory does not grow with the table
+    listing, total, query = listing_with_counts(key_column, enrollment_column, search)
+    pagination = {
+        "page": 1,
+        "per_page": total,
+        "pages": 1,
+        "total": total,
+        "offset": 0,
+        "q": query,
+    }
+    rows = listing.yield_per(STREAM_BATCH) if total else []
+    body = buffered(stream_template(template, **{name: rows}, pagination=pagination))
+
+    headers = {"Vary": "Accept-Encoding"}
+    if app.config["STREAM_GZIP"] and "gzip" in request.accept_encodings:
+        body = gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype="text/html", headers=headers)
+
+
 @app.route("/", methods=["GET"])
 def index():
     # It will render all student or Add a student and go to the courses page
-    students = Student.query.all()
-    return render_template("index.html", students=students), 200
+    if request.args.get("all"):
+        return stream_listing(
+            "index.html",
+            "students",
+            Student.student_id,
+            Enrollment.estudent_id,
+            student_search,
+        )
+    students, pagination = paginate_with_counts(
+        Student.student_id, Enrollment.estudent_id, student_search
+    )
+    return (
+        render_template("index.html", students=students, pagination=pagination),
+        200,
+    )
 
 
 @app.route("/courses", methods=["GET"])
 def courses():
     # This route would display a list of all courses
     # If no courses exist, it would return an empty list or a message
-    courses = Course.query.all()
-    return render_template("courses.html", courses=courses), 200
+    if request.args.get("all"):
+        return stream_listing(
+            "courses.html",
+            "courses",
+            Course.course_id,
+            Enrollment.ecourse_id,
+            course_search,
+        )
+    courses, pagination = paginate_with_counts(
+        Course.course_id, Enrollment.ecourse_id, course_search
+    )
+    return (
+        render_template("courses.html", courses=courses, pagination=pagination),
+        200,
+    )
 
 
 @app.route("/course/create", methods=["GET", "POST"])
@@ -74,20 +230,62 @@ def create_course():
     return render_template("create_course.html"), 200
 
 
+DELETE_BATCH = 500
+
+
+def delete_courses(course_ids: list) -> int:
+    # Set-based: one DELETE for the enrollments and one for the courses per
+    # batch of ids, without loading any ORM object
+    deleted = 0
+    for start in range(0, len(course_ids), DELETE_BATCH):
+        batch = course_ids[start : start + DELETE_BATCH]
+        Enrollment.query.filter(Enrollment.ecourse_id.in_(batch)).delete(
+            synchronize_session=False
+        )
+        deleted += Course.query.filter(Course.course_id.in_(batch)).delete(
+            synchronize_session=False
+        )
+    return deleted
+
+
+def delete_students(student_ids: list) -> int:
+    deleted = 0
+    for start in range(0, len(student_ids), DELETE_BATCH):
+        batch = student_ids[start : start + DELETE_BATCH]
+        Enrollment.query.filter(Enrollment.estudent_id.in_(batch)).delete(
+            synchronize_session=False
+        )
+        deleted += Student.query.filter(Student.student_id.in_(batch)).delete(
+            synchronize_session=False
+        )
+    return deleted
+
+
+def selected_ids() -> list:
+    # Checkbox values (ids=1&ids=2) or one comma separated ids field
+    ids = []
+    for value in request.form.getlist("ids"):
+        ids.extend(part.strip() for part in value.split(","))
+    return sorted({int(part) for part in ids if part.isdigit()})
+
+
 @app.route("/course/<int:course_id>/delete", methods=["GET"])
 def delete_course(course_id):
-    course = Course.query.get(course_id)
-    if course:
-        enrollments = Enrollment.query.filter_by(ecourse_id=course_id).all()
-        for enrollment in enrollments:
-            db.session.delete(enrollment)
-        db.session.delete(course)
+    if delete_courses([course_id]):
         db.session.commit()
         return redirect(url_for("courses"))
     else:
+        db.session.rollback()
         return "Course not found", 404
 
 
+@app.route("/course/delete", methods=["POST"])
+def bulk_delete_courses():
+    delete_courses(selected_ids())
+    db.session.commit()
+    return redirect(url_for("courses"))
+
+
 @app.route("/course/<int:course_id>", methods=["GET"])
 def course_detail(course_id):
     # This route would display the details of a specific course along with its enrolled students
@@ -154,18 +352,21 @@ def create_student():
 def delete_student(student_id):
     # This route would handle the deletion of a student
     # If student does not exist, it would return an error message
-    student = Student.query.get(student_id)
-    if student:
-        enrollment = Enrollment.query.filter_by(estudent_id=student_id).first()
-        if enrollment:
-            db.session.delete(enrollment)
-        db.session.delete(student)
+    if delete_students([student_id]):
         db.session.commit()
         return redirect(url_for("index"))
     else:
+        db.session.rollback()
         return "Student not found", 404
 
 
+@app.route("/student/delete", methods=["POST"])
+def bulk_delete_students():
+    delete_students(selected_ids())
+    db.session.commit()
+    return redirect(url_for("index"))
+
+
 @app.route("/student/<int:student_id>", methods=["GET"])
 def student_detail(student_id):
     # This route would display the details of a specific student
@@ -200,13 +401,17 @@ def update_student(student_id):
 
         student.first_name = request.form.get("f_name")
         student.last_name = request.form.get("l_name")
-        if enrollment:
-            enrollment.ecourse_id = int(request.form.get("course"))
-        else:
-            new_enrollment = Enrollment(
-                estudent_id=student_id, ecourse_id=int(request.form.get("course"))
-            )
+        course_id = int(request.form.get("course"))
+        # Already enrolled in that course: moving another enrollment there
+        # would break the unique (student, course) index
+        enrolled = Enrollment.query.filter_by(
+            estudent_id=student_id, ecourse_id=course_id
+        ).first()
+        if enrollment is None:
+            new_enrollment = Enrollment(estudent_id=student_id, ecourse_id=course_id)
             db.session.add(new_enrollment)
+        elif enrolled is None:
+            enrollment.ecourse_id = course_id
 
         db.session.commit()
         return redirect(url_for("index"))
@@ -226,5 +431,88 @@ def withdraw_student(student_id, course_id):
         return "Enrollment not found", 404
 
 
+EXPORTS = ["students", "courses", "enrollments"]
+
+
+def export_spec(entity):
+    if entity == "students":
+        return ExportSpec(
+            select(
+                Student.student_id,
+                Student.roll_number,
+                Student.first_name,
+                Student.last_name,
+            ).order_by(Student.student_id),
+            ["student_id", "roll_number", "first_name", "last_name"],
+        )
+    if entity == "courses":
+        return ExportSpec(
+            select(
+                Course.course_id,
+                Course.course_code,
+                Course.course_name,
+                Course.course_description,
+            ).order_by(Course.course_id),
+            ["course_id", "course_code", "course_name", "course_description"],
+        )
+    if entity == "enrollments":
+        # Same columns as the week6 export. There are no marks in this app,
+        # so the Marks column of the week3/week4 CSV format stays empty.
+        return ExportSpec(
+            select(
+                Enrollment.estudent_id,
+                Enrollment.ecourse_id,
+                null(),
+                Student.roll_number,
+                Student.first_name,
+                Student.last_name,
+                Course.course_code,
+                Course.course_name,
+            )
+            .join(Student, Student.student_id == Enrollment.estudent_id)
+            .join(Course, Course.course_id == Enrollment.ecourse_id)
+            .order_by(Enrollment.enrollment_id),
+            [
+                "student_id",
+                "course_id",
+                "marks",
+                "roll_number",
+                "first_name",
+                "last_name",
+                "course_code",
+                "course_name",
+            ],
+            csv_keys=["student_id", "course_id", "marks"],
+            csv_header="Student id, Course id, Marks",
+        )
+    return None
+
+
+@app.route("/export/<entity>", methods=["GET"])
+def export(entity):
+    fmt = request.args.get("format", "csv")
+    spec = export_spec(entity)
+    if spec is None:
+        return "Export one of students, courses or enrollments", 404
+    if fmt not in FORMATS:
+        return "format must be csv or ndjson", 400
+
+    chunks = export_chunks(db.session, spec, fmt)
+    return Response(
+        stream_with_context(chunk.encode() for chunk in chunks),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={entity}.{fmt}"},
+    )
+
+
+@app.cli.command("export")
+@click.argument("entity", type=click.Choice(EXPORTS))
+@click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="csv")
+@click.option("-o", "--output", type=click.File("w"), default="-")
+def export_command(entity, fmt, output):
+    # flask --app app export enrollments --format ndjson -o enrollments.ndjson
+    export_to_file(db.session, export_spec(entity), fmt, output)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
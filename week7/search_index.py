@@ -0,0 +1,98 @@
+import re
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, event, inspect
+from sqlalchemy import select, text
+
+
+def match_expression(query: str) -> str:
+    # Every word of the query has to match the start of some token:
+    # "jo sm" -> "jo"* "sm"*
+    words = re.findall(r"\w+", query or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class SearchIndex:
+    # External content FTS5 table over some columns of a regular table,
+    # kept in sync by triggers on that table
+    def __init__(self, name: str, table: Table, columns: list):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.key = list(table.primary_key.columns)[0].name
+        # Only describes the virtual table for queries, never created by
+        # create_all since it lives in its own MetaData
+        self.fts = Table(
+            name, MetaData(), Column("rowid", Integer), Column("rank", Float)
+        )
+
+    def create(self, connection):
+        columns = ", ".join(self.columns)
+        new_values = ", ".join(f"new.{column}" for column in self.columns)
+        old_values = ", ".join(f"old.{column}" for column in self.columns)
+        source = self.table.name
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": self.name}
+        ).first()
+
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+                f"{columns}, content='{source}', content_rowid='{self.key}', "
+                "prefix='2 3')"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_insert AFTER INSERT ON {source} "
+                f"BEGIN INSERT INTO {self.name}(rowid, {columns}) "
+                f"VALUES (new.{self.key}, {new_values}); END"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_delete AFTER DELETE ON {source} "
+                f"BEGIN INSERT INTO {self.name}({self.name}, rowid, {columns}) "
+                f"VALUES ('delete', old.{self.key}, {old_values}); END"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_update AFTER UPDATE ON {source} "
+                f"BEGIN INSERT INTO {self.name}({self.name}, rowid, {columns}) "
+                f"VALUES ('delete', old.{self.key}, {old_values}); "
+                f"INSERT INTO {self.name}(rowid, {columns}) "
+                f"VALUES (new.{self.key}, {new_values}); END"
+            )
+        )
+        if not exists:
+            # Index the rows that were there before the table existed
+            connection.execute(
+                text(f"INSERT INTO {self.name}({self.name}) VALUES ('rebuild')")
+            )
+
+    def matches(self, query: str):
+        # (rowid, rank) of the hits, best first when ordered by rank
+        return (
+            select(self.fts.c.rowid, self.fts.c.rank)
+            .where(
+                text(f"{self.name} MATCH :query").bindparams(
+                    query=match_expression(query)
+                )
+            )
+            .subquery()
+        )
+
+
+def install_search(app, db, *indexes):
+    # Creates the FTS tables and triggers now for existing tables, and later
+    # right after create_all creates a missing one
+    for index in indexes:
+        event.listen(
+            index.table,
+            "after_create",
+            lambda target, connection, index=index, **kw: index.create(connection),
+        )
+    with app.app_context(), db.engine.begin() as connection:
+        for index in indexes:
+            if inspect(connection).has_table(index.table.name):
+                index.create(connection)
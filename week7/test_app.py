@@ -0,0 +1,169 @@
+import os
+import tempfile
+import tracemalloc
+
+import pytest
+from sqlalchemy import event, insert
+
+# app.py connects at import time
+database_dir = tempfile.TemporaryDirectory()
+os.environ["WEEK7_DATABASE_URI"] = f"sqlite:///{database_dir.name}/test.sqlite3"
+
+from app import app, db, Course, Enrollment, Student  # noqa: E402
+
+
+SMALL = 20
+LARGE = 2000
+ROSTER = 5000
+
+
+@pytest.fixture(scope="module")
+def client():
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+    yield app.test_client()
+    engine.dispose()
+    database_dir.cleanup()
+
+
+@pytest.fixture
+def statements(client):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        for model in (Enrollment, Student, Course):
+            db.session.query(model).delete()
+        db.session.commit()
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def seed(students, courses, enrollments):
+    # Adds the ids up to students and courses that are not there yet, so a
+    # table can be grown between two requests
+    with app.app_context():
+        first = db.session.query(Student).count() + 1
+        rows_students = [
+            {"student_id": i, "roll_number": f"R{i}", "first_name": f"Student {i}"}
+            for i in range(first, students + 1)
+        ]
+        first = db.session.query(Course).count() + 1
+        rows_courses = [
+            {"course_id": i, "course_code": f"C{i}", "course_name": f"Course {i}"}
+            for i in range(first, courses + 1)
+        ]
+        rows_enrollments = [
+            {"estudent_id": student_id, "ecourse_id": course_id}
+            for student_id, course_id in enrollments
+        ]
+        for model, batch in [
+            (Student, rows_students),
+            (Course, rows_courses),
+            (Enrollment, rows_enrollments),
+        ]:
+            if batch:
+                db.session.execute(insert(model), batch)
+        db.session.commit()
+
+
+def statements_for(client, statements, method, url, **kwargs):
+    statements.clear()
+    response = client.open(url, method=method, **kwargs)
+    # Streamed listings only run their queries while the body is read
+    response.get_data()
+    assert response.status_code in (200, 302)
+    return len(statements)
+
+
+def enroll_everyone(students, courses):
+    return [(i, i % courses + 1) for i in range(1, students + 1)]
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/?per_page=500",
+        "/?per_page=500&page=2",
+        "/?all=1",
+        "/courses?per_page=500",
+        "/courses?per_page=500&page=2",
+        "/courses?all=1",
+    ],
+)
+def test_listing_statements_do_not_grow_with_table(client, statements, url):
+    seed(SMALL, SMALL, enroll_everyone(SMALL, SMALL))
+    small = statements_for(client, statements, "GET", url)
+
+    grown = [(i, i % LARGE + 1) for i in range(SMALL + 1, LARGE + 1)]
+    seed(LARGE, LARGE, grown)
+    large = statements_for(client, statements, "GET", url)
+    assert 0 < large == small
+
+
+def delete_cost(client, statements, method, url, **kwargs):
+    tracemalloc.start()
+    try:
+        count = statements_for(client, statements, method, url, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return count, peak
+
+
+@pytest.mark.parametrize(
+    "kind, url",
+    [("course", "/course/{}/delete"), ("student", "/student/{}/delete")],
+)
+def test_delete_does_not_load_the_roster(client, statements, kind, url):
+    # 1 has ROSTER enrollments, 2 only SMALL
+    seed(ROSTER + 2, ROSTER + 2, [])
+    if kind == "course":
+        seed(0, 0, [(i, 1) for i in range(3, ROSTER + 3)])
+        seed(0, 0, [(i, 2) for i in range(3, SMALL + 3)])
+    else:
+        seed(0, 0, [(1, i) for i in range(3, ROSTER + 3)])
+        seed(0, 0, [(2, i) for i in range(3, SMALL + 3)])
+
+    small, small_peak = delete_cost(client, statements, "GET", url.format(2))
+    large, large_peak = delete_cost(client, statements, "GET", url.format(1))
+    assert 0 < large == small
+    # The first request also pays for warming up Flask and SQLAlchemy, the
+    # enrollments loaded as objects would take several megabytes
+    assert max(small_peak, large_peak) < 1024 * 1024
+
+    with app.app_context():
+        assert db.session.query(Enrollment).count() == 0
+
+
+def test_bulk_delete_statements_do_not_grow_with_enrollments(client, statements):
+    # Courses 1-10 have one enrollment each, 11-20 share ROSTER
+    enrollments = [(i, i) for i in range(1, 11)]
+    enrollments += [(i, i % 10 + 11) for i in range(1, ROSTER + 1)]
+    seed(ROSTER, 20, enrollments)
+    form = {"ids": ",".join(str(i) for i in range(1, 11))}
+    first = statements_for(client, statements, "POST", "/course/delete", data=form)
+    form = {"ids": ",".join(str(i) for i in range(11, 21))}
+    second = statements_for(client, statements, "POST", "/course/delete", data=form)
+    assert 0 < first == second
+
+    with app.app_context():
+        assert db.session.query(Enrollment).count() == 0
+        assert db.session.query(Course).count() == 0
+
+
+def test_update_student_to_a_course_they_are_already_in(client, statements):
+    seed(1, 2, [(1, 1), (1, 2)])
+    form = {"f_name": "Renamed", "l_name": "", "course": "2"}
+    response = client.post("/student/1/update", data=form)
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert db.session.get(Student, 1).first_name == "Renamed"
+        enrollments = db.session.query(Enrollment.ecourse_id).order_by("ecourse_id")
+        assert [course_id for course_id, in enrollments] == [1, 2]